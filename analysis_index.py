@@ -0,0 +1,196 @@
+import math
+import re
+from bisect import bisect_left
+from data.analysis_ref import analysis_ref
+
+NUM = r"(\d+(?:[.,]\d+)?)"
+RANGE_RE = re.compile(rf"^\s*{NUM}\s*[-–—]\s*{NUM}\s*(.*)$")
+UPPER_RE = re.compile(rf"^\s*(?:до|<|≤|<=)\s*{NUM}\s*(.*)$", re.I)
+LOWER_RE = re.compile(rf"^\s*(?:от|более|>|≥|>=)\s*{NUM}\s*(.*)$", re.I)
+MIN_SIMILARITY = 0.35
+# короче — префикс засчитывается, только если подходит к одному параметру ("a" — и ALT, и AST)
+MIN_PREFIX = 3
+
+
+def _num(s):
+    return float(s.replace(",", "."))
+
+
+def _fmt(x):
+    return f"{x:g}".replace(".", ",")
+
+
+class Norm:
+    """Норма, разобранная из строки вида "130-170 г/л", "до 40 Ед/л", "от 5"."""
+
+    __slots__ = ("low", "high", "unit", "text")
+
+    def __init__(self, low, high, unit, text):
+        self.low = low
+        self.high = high
+        self.unit = unit
+        self.text = text
+
+    @classmethod
+    def parse(cls, text):
+        if not text:
+            return None
+        m = RANGE_RE.match(text)
+        if m:
+            return cls(_num(m.group(1)), _num(m.group(2)), m.group(3).strip(), text)
+        m = UPPER_RE.match(text)
+        if m:
+            return cls(None, _num(m.group(1)), m.group(2).strip(), text)
+        m = LOWER_RE.match(text)
+        if m:
+            return cls(_num(m.group(1)), None, m.group(2).strip(), text)
+        return cls(None, None, "", text)
+
+    @classmethod
+    def union(cls, a, b):
+        """Общая норма, когда пол неизвестен: от меньшей нижней до большей верхней границы."""
+        lows = [n.low for n in (a, b) if n.low is not None]
+        highs = [n.high for n in (a, b) if n.high is not None]
+        return cls(min(lows) if lows else None, max(highs) if highs else None, a.unit or b.unit,
+                   f"муж. {a.text}, жен. {b.text}")
+
+    def check(self, value):
+        """-1 ниже нормы, 0 в норме, 1 выше, None — норма не числовая."""
+        if self.low is None and self.high is None:
+            return None
+        if self.low is not None and value < self.low:
+            return -1
+        if self.high is not None and value > self.high:
+            return 1
+        return 0
+
+
+def normalize(name):
+    return re.sub(r"[^0-9a-zа-я]", "", name.lower().replace("ё", "е"))
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def sex_key(sex):
+    s = (sex or "").strip().lower()
+    if s[:1] in ("m", "м"):
+        return "m"
+    if s[:1] in ("f", "ж", "w"):
+        return "f"
+    return None
+
+
+class Param:
+    __slots__ = ("key", "name", "norms", "texts")
+
+    def __init__(self, key, info):
+        self.key = key
+        self.name = info.get("name", key)
+        if "norm" in info:
+            norm = Norm.parse(info["norm"])
+            self.norms = {"m": norm, "f": norm, None: norm}
+        else:
+            m, f = Norm.parse(info.get("norm_m")), Norm.parse(info.get("norm_f"))
+            if m and f:
+                self.norms = {"m": m, "f": f, None: Norm.union(m, f)}
+            else:
+                norm = m or f or Norm(None, None, "", "-")
+                self.norms = {"m": norm, "f": norm, None: norm}
+        # справка рендерится заранее под каждый вариант пола
+        tail = f"{info.get('what','')}\n\nСовет: {info.get('advice','Обратитесь к врачу при сомнениях')}"
+        self.texts = {sex: f"🩺 {self.name}\nНорма: {norm.text}\n{tail}" for sex, norm in self.norms.items()}
+
+    def evaluate(self, value, sex=None):
+        norm = self.norms[sex]
+        status = norm.check(value)
+        unit = f" {norm.unit}" if norm.unit else ""
+        verdict = {None: "норма не числовая", -1: "ниже нормы ⬇️", 0: "в норме ✅", 1: "выше нормы ⬆️"}[status]
+        return f"{self.name}: {_fmt(value)}{unit} — {verdict} ({norm.text})"
+
+
+class AnalysisIndex:
+    """Индекс справочника анализов, строится один раз при загрузке.
+
+    Имя ищется точным совпадением (ключ, русское название, синонимы), затем по префиксу
+    (бинпоиск по отсортированным именам; короткий — только однозначный), затем по похожести триграмм — так поиск
+    терпит опечатки, а время не растёт с размером справочника.
+    """
+
+    def __init__(self, ref):
+        self.params = {}
+        self.exact = {}
+        self.trigram_index = {}
+        self.name_trigrams = {}
+        for key, info in ref.items():
+            self.params[key] = Param(key, info)
+            for name in [key, info.get("name", "")] + list(info.get("aliases", [])):
+                n = normalize(name)
+                if n and n not in self.exact:
+                    self.exact[n] = key
+        for n in self.exact:
+            grams = frozenset(trigrams(n))
+            self.name_trigrams[n] = grams
+            for g in grams:
+                self.trigram_index.setdefault(g, []).append(n)
+        self.sorted_names = sorted(self.exact)
+
+    def find(self, query):
+        q = normalize(query)
+        if not q:
+            return None
+        key = self.exact.get(q)
+        if key:
+            return self.params[key]
+        key = self._prefix(q)
+        if key:
+            return self.params[key]
+        grams = trigrams(q)
+        # похожее имя обязано делить с запросом не меньше need триграмм, значит встретится
+        # хотя бы в одном из len(grams) - need + 1 самых коротких списков — длинные не читаем
+        need = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+        postings = sorted((self.trigram_index.get(g, ()) for g in grams), key=len)
+        candidates = set()
+        for names in postings[:len(grams) - need + 1]:
+            candidates.update(names)
+        best, best_score = None, 0.0
+        for n in candidates:
+            other = self.name_trigrams[n]
+            common = len(grams & other)
+            score = common / (len(grams) + len(other) - common)
+            if score > best_score:
+                best, best_score = n, score
+        if best_score >= MIN_SIMILARITY:
+            return self.params[self.exact[best]]
+        return None
+
+    def _prefix(self, q):
+        i = bisect_left(self.sorted_names, q)
+        if i == len(self.sorted_names) or not self.sorted_names[i].startswith(q):
+            return None
+        first = self.exact[self.sorted_names[i]]
+        if len(q) >= MIN_PREFIX:
+            return first
+        for n in self.sorted_names[i + 1:]:
+            if not n.startswith(q):
+                break
+            if self.exact[n] != first:
+                return None
+        return first
+
+
+def parse_values(text):
+    """"hemoglobin=118 ALT=55,5" -> [("hemoglobin", "118"), ("ALT", "55,5")]; без "=" — значение None."""
+    items = []
+    for part in text.split():
+        if "=" in part:
+            name, value = part.split("=", 1)
+            items.append((name, value))
+        else:
+            items.append((part, None))
+    return items
+
+
+index = AnalysisIndex(analysis_ref)
@@ -0,0 +1,65 @@
+"""Сравнение старого скалярного расчёта биоритма с табличным bio_engine.
+
+    python -m bench.bench_biorhythm [--days 30] [--users 100000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import bio_engine
+
+
+def scalar_day(birth, day):
+    # как было в handlers/biorhythm.py: три math.sin на каждый день
+    days = (day - birth).days
+    return (
+        round(100 * math.sin(2 * math.pi * days / 23), 2),
+        round(100 * math.sin(2 * math.pi * days / 28), 2),
+        round(100 * math.sin(2 * math.pi * days / 33), 2),
+    )
+
+
+def scalar_forecast(birth, start, n):
+    return [scalar_day(birth, start + timedelta(days=i)) for i in range(n)]
+
+
+def best(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    birth = datetime(1990, 5, 1)
+    today = datetime.combine(date.today(), datetime.min.time())
+    expected = np.array(scalar_forecast(birth, today, args.days)).T
+    got = bio_engine.forecast(birth.date(), today.date(), args.days)
+    assert np.allclose(expected, got), "табличный расчёт расходится со скалярным"
+
+    t_scalar = best(lambda: scalar_forecast(birth, today, args.days), 200)
+    t_vector = best(lambda: bio_engine.forecast(birth.date(), today.date(), args.days), 200)
+    print(f"прогноз на {args.days} дн.: скалярно {t_scalar * 1e6:.1f} мкс, таблицы {t_vector * 1e6:.1f} мкс "
+          f"(x{t_scalar / t_vector:.1f})")
+
+    rnd = random.Random(1)
+    births = [date(1950, 1, 1) + timedelta(days=rnd.randrange(25000)) for _ in range(args.users)]
+    ordinals = np.array([b.toordinal() for b in births], dtype=np.int64)
+    births_dt = [datetime.combine(b, datetime.min.time()) for b in births]
+    t_scalar = best(lambda: [scalar_day(b, today) for b in births_dt], 1)
+    t_vector = best(lambda: bio_engine.today_batch(ordinals, today.date()), 5)
+    print(f"сегодня для {args.users} пользователей: скалярно {t_scalar * 1e3:.1f} мс, "
+          f"пакетом {t_vector * 1e3:.2f} мс (x{t_scalar / t_vector:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Холодный старт: время от запуска интерпретатора до первого ответа на команду.
+
+Каждый замер — отдельный процесс: import main, затем один апдейт в /webhook (sync-режим,
+Bot API — локальный поддельный сервер). Сравнивает ленивую загрузку обработчиков с
+предзагрузкой всего сразу (как было до таблицы диспетчера).
+
+    python -m bench.bench_startup [--runs 5] [--commands /start,/yoga,/biorhythm]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(command, eager):
+    started = time.perf_counter()
+    import main
+    if eager:
+        from dispatcher import dispatcher
+        import scheduler, tg_client  # noqa: F401
+        dispatcher.preload()
+    imported = time.perf_counter()
+    update = {"update_id": 1, "message": {"message_id": 1, "chat": {"id": 1, "type": "private"},
+                                          "from": {"id": 1, "first_name": "Bench"}, "text": command}}
+    status = main.app.test_client().post("/webhook", data=json.dumps(update)).status_code
+    done = time.perf_counter()
+    print(json.dumps({"status": status, "import_s": imported - started, "first_s": done - started,
+                      "modules": len(sys.modules)}))
+
+
+def run_once(command, eager, env):
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-m", "bench.bench_startup", "--child", command]
+                         + (["--eager"] if eager else []),
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_s"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--commands", default="/start,/yoga,/biorhythm")
+    parser.add_argument("--child")
+    parser.add_argument("--eager", action="store_true")
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.eager)
+        return
+
+    from bench.fake_bot_api import FakeBotAPI
+    api = FakeBotAPI(latency=0.0, chat_rate=1000, global_rate=1000).start()
+    tmp = tempfile.mkdtemp(prefix="bench-startup-")
+    env = dict(os.environ, TELEGRAM_API_URL=api.url, BOT_TOKEN="TEST", WEBHOOK_MODE="sync",
+               SCHEDULER_ENABLED="0", PRELOAD_HANDLERS="0", DB_PATH=os.path.join(tmp, "bench.db"),
+               WATER_JOURNAL_DIR=os.path.join(tmp, "journal"), METRICS_DIR=os.path.join(tmp, "metrics"))
+    report = []
+    for command in args.commands.split(","):
+        # /start и разделы отвечают прямо из webhook; INLINE_REPLIES=0 заставляет идти через диспетчер
+        for inline in ("1", "0"):
+            if inline == "1" and command in ("/biorhythm",):
+                continue
+            for eager in (False, True):
+                runs = [run_once(command, eager, dict(env, INLINE_REPLIES=inline)) for _ in range(args.runs)]
+                assert all(r["status"] == 200 for r in runs)
+                report.append({
+                    "command": command,
+                    "inline": inline == "1",
+                    "loading": "eager" if eager else "lazy",
+                    "import_ms": round(statistics.median(r["import_s"] for r in runs) * 1000, 1),
+                    "first_response_ms": round(statistics.median(r["first_s"] for r in runs) * 1000, 1),
+                    "process_ms": round(statistics.median(r["process_s"] for r in runs) * 1000, 1),
+                    "modules": runs[0]["modules"],
+                })
+    api.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Прогон TelegramClient против локального поддельного Bot API.
+
+Проверяет, что клиент укладывается в лимиты (сервер отвечает 429 при превышении),
+повторяет 429/5xx и склеивает сообщения одного чата; печатает пропускную способность и p99.
+
+    python -m bench.bench_tg_client [--messages 300] [--chats 100]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_bot_api import FakeBotAPI
+from tg_client import TelegramClient
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    # сервер строже клиента по per-chat лимиту — клиент не должен ловить 429 на своих же лимитах
+    api = FakeBotAPI(latency=args.latency, chat_rate=1.0, global_rate=args.global_rate,
+                     error_rate=args.error_rate).start()
+    client = TelegramClient(token="TEST", base_url=api.url, global_rate=args.global_rate,
+                            chat_rate=1.0, chat_burst=1, senders=8)
+    started = time.monotonic()
+    for i in range(args.messages):
+        client.submit(i % args.chats, f"сообщение {i}")
+    assert client.drain(timeout=600), "очередь не опустела"
+    elapsed = time.monotonic() - started
+    api.stop()
+
+    delivered = sum(c["params"]["text"].count("сообщение") for c in api.calls)
+    assert delivered == args.messages, f"доставлено {delivered} из {args.messages}"
+    stats = client.stats()
+    stats.update(elapsed_s=round(elapsed, 2), api_calls=len(api.calls), server_429=api.throttled,
+                 server_5xx=api.errors, messages_per_s=round(args.messages / elapsed, 1))
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Хранение истории воды: старая таблица water (day TEXT, rowid) против water_days (day INTEGER, WITHOUT ROWID).
+
+Заполняет обе схемы одинаковыми данными в порядке поступления (день за днём по всем
+пользователям), затем сравнивает размер файла и задержку чтения диапазона неделя/месяц/год.
+
+    python -m bench.bench_water_series [--users 3000] [--days 365] [--queries 500]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMAS = {
+    "water (TEXT day, rowid)": {
+        "ddl": "CREATE TABLE water (tg_id INTEGER, day TEXT, amount_ml INTEGER, PRIMARY KEY (tg_id, day))",
+        "insert": "INSERT INTO water VALUES (?, ?, ?)",
+        "range": "SELECT day, amount_ml FROM water WHERE tg_id = ? AND day BETWEEN ? AND ?",
+        "key": lambda d: d.isoformat(),
+    },
+    "water_days (ordinal, WITHOUT ROWID)": {
+        "ddl": "CREATE TABLE water_days (tg_id INTEGER, day INTEGER, amount_ml INTEGER, "
+               "PRIMARY KEY (tg_id, day)) WITHOUT ROWID",
+        "insert": "INSERT INTO water_days VALUES (?, ?, ?)",
+        "range": "SELECT day, amount_ml FROM water_days WHERE tg_id = ? AND day BETWEEN ? AND ?",
+        "key": lambda d: d.toordinal(),
+    },
+}
+PERIODS = {"week": 7, "month": 30, "year": 365}
+
+
+def build(path, schema, users, days, start):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(schema["ddl"])
+    rnd = random.Random(1)
+    started = time.perf_counter()
+    for i in range(days):
+        key = schema["key"](start + timedelta(days=i))
+        conn.execute("BEGIN")
+        conn.executemany(schema["insert"], ((u, key, rnd.randrange(250, 3000, 250)) for u in range(users)))
+        conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    build_s = time.perf_counter() - started
+    conn.close()
+    return build_s
+
+
+def measure(path, schema, users, last, queries, cold):
+    result = {}
+    rnd = random.Random(2)
+    conn = sqlite3.connect(path)
+    for period, n in PERIODS.items():
+        lo, hi = schema["key"](last - timedelta(days=n - 1)), schema["key"](last)
+        times = []
+        for _ in range(queries):
+            if cold:
+                # новое соединение — пустой кэш страниц SQLite (кэш ОС остаётся)
+                conn.close()
+                conn = sqlite3.connect(path)
+            tg_id = rnd.randrange(users)
+            started = time.perf_counter()
+            rows = conn.execute(schema["range"], (tg_id, lo, hi)).fetchall()
+            times.append(time.perf_counter() - started)
+            assert len(rows) == n
+        times.sort()
+        result[period] = {"p50_us": round(statistics.median(times) * 1e6, 1),
+                          "p99_us": round(times[int(len(times) * 0.99) - 1] * 1e6, 1)}
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    last = start + timedelta(days=args.days - 1)
+    tmp = tempfile.mkdtemp(prefix="bench-water-")
+    report = {"rows": args.users * args.days}
+    for name, schema in SCHEMAS.items():
+        path = os.path.join(tmp, f"{len(report)}.db")
+        build_s = build(path, schema, args.users, args.days, start)
+        report[name] = {
+            "size_mb": round(os.path.getsize(path) / 2**20, 1),
+            "build_s": round(build_s, 2),
+            "warm": measure(path, schema, args.users, last, args.queries, cold=False),
+            "cold": measure(path, schema, args.users, last, args.queries, cold=True),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Локальный поддельный Bot API: принимает вызовы, запоминает их и отвечает как Telegram.
+
+Умеет имитировать лимиты Telegram (429 с retry_after), ошибки 5xx и задержку ответа.
+
+    python -m bench.fake_bot_api --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_RE = re.compile(r"^/bot[^/]*/(\w+)$")
+
+
+class FakeBotAPI:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, chat_rate=None, global_rate=None,
+                 error_rate=0.0):
+        self.latency = latency
+        self.chat_rate = chat_rate
+        self.global_rate = global_rate
+        self.error_rate = error_rate
+        self.calls = []
+        self.throttled = 0
+        self.errors = 0
+        self._last_chat = {}
+        self._global_times = []
+        self._lock = threading.Lock()
+        self._listeners = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # заголовки и тело уходят разными write — без TCP_NODELAY keep-alive ждёт delayed ACK (~40 мс)
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                m = PATH_RE.match(self.path)
+                if not m:
+                    return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+                try:
+                    params = json.loads(raw) if raw else {}
+                except ValueError:
+                    params = {}
+                status, body = api.handle(m.group(1), params)
+                self._reply(status, body)
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def handle(self, method, params):
+        if self.latency:
+            time.sleep(self.latency)
+        now = time.monotonic()
+        chat_id = params.get("chat_id")
+        with self._lock:
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+            if self.chat_rate and chat_id is not None:
+                last = self._last_chat.get(chat_id)
+                # небольшой допуск: время на клиенте и на сервере расходится на величину задержки сети
+                if last is not None and now - last < 0.8 / self.chat_rate:
+                    self.throttled += 1
+                    return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                 "parameters": {"retry_after": 1}}
+            if self.global_rate:
+                self._global_times = [t for t in self._global_times if now - t < 1.0]
+                if len(self._global_times) >= self.global_rate:
+                    self.throttled += 1
+                    return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                 "parameters": {"retry_after": 1}}
+                self._global_times.append(now)
+            if chat_id is not None:
+                self._last_chat[chat_id] = now
+            call = {"method": method, "params": params, "at": now}
+            self.calls.append(call)
+            listeners = list(self._listeners)
+        for fn in listeners:
+            fn(call)
+        result = {"message_id": len(self.calls), "date": int(time.time()),
+                  "chat": {"id": chat_id, "type": "private"}, "text": params.get("text")}
+        return 200, {"ok": True, "result": result}
+
+    def on_call(self, fn):
+        """fn(call) вызывается на каждый принятый вызов (из потока сервера)."""
+        with self._lock:
+            self._listeners.append(fn)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chat-rate", type=float, default=None)
+    parser.add_argument("--global-rate", type=float, default=None)
+    args = parser.parse_args()
+    api = FakeBotAPI(port=args.port, latency=args.latency, chat_rate=args.chat_rate,
+                     global_rate=args.global_rate)
+    print(f"Fake Bot API: {api.url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nвызовов: {len(api.calls)}, 429: {api.throttled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Нагрузочный прогон: синтетические апдейты Telegram через /webhook Flask-приложения.
+
+Приложение поднимается в этом же процессе на werkzeug (threaded), исходящие вызовы уходят
+в локальный поддельный Bot API. Каждый из --concurrency клиентов ведёт своих пользователей
+и ждёт ответа на апдейт, прежде чем слать следующий (замкнутый цикл), поэтому задержка —
+от POST /webhook до ответа пользователю: тело webhook для статических команд или
+sendMessage в поддельный Bot API для остальных. Перед замером каждый пользователь заполняет
+профиль (/setprofile) — этот прогрев в статистику не входит.
+
+    python -m bench.loadtest [--requests 2000] [--concurrency 16] [--mode queue|sync] \\
+        [--output results.json] [--baseline old.json --threshold 0.2]
+
+Код возврата 1 — регрессия относительно --baseline: p95/p99 какой-либо команды выросли
+больше чем на threshold или пропускная способность упала больше чем на threshold.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECTIONS = ("health", "mind", "soul", "productivity", "lifestyle", "practices", "resources")
+WAIT_TIMEOUT = 30.0
+
+
+def command_mix(recipe_keys):
+    """Имя в отчёте -> генератор текста команды."""
+    return {
+        "start": lambda r: "/start",
+        "help": lambda r: "/help",
+        "section": lambda r: "/" + r.choice(SECTIONS),
+        "water": lambda r: f"/water {r.choice((150, 200, 250, 330, 500))}",
+        "water_status": lambda r: "/water status",
+        "water_week": lambda r: "/water week",
+        "setprofile": lambda r: (f"/setprofile sex={r.choice('mf')} age={r.randint(18, 70)} "
+                                 f"height={r.randint(150, 200)} weight={r.randint(45, 120)} "
+                                 f"birth={r.randint(1960, 2005)}-{r.randint(1, 12):02d}-{r.randint(1, 28):02d}"),
+        "profile": lambda r: "/profile",
+        "biorhythm": lambda r: "/biorhythm",
+        "analysis": lambda r: r.choice(("/analysis hemoglobin=118 ALT=55", "/analysis глюкоза=6,1",
+                                        "/analysis гемоглобн")),
+        "recipe": lambda r: f"/recipe {r.choice(recipe_keys)}",
+        "recipes": lambda r: "/recipes курица kcal<=600",
+        "mealplan": lambda r: "/mealplan",
+        "exercise": lambda r: "/exercise",
+        "daily": lambda r: "/daily",
+        "challenge": lambda r: "/challenge",
+    }
+
+
+def make_update(update_id, user_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "ru"},
+            "text": text,
+        },
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2) if values else None,
+    }
+
+
+def lock_hist(metrics):
+    """Гистограмма db_lock_wait_seconds, сложенная по всем БД: корзины + count + sum."""
+    h = [0] * (len(metrics.BUCKETS) + 3)
+    for name, _, values in metrics.snapshot()["hists"]:
+        if name == "db_lock_wait_seconds":
+            h = [a + b for a, b in zip(h, values)]
+    return h
+
+
+def lock_waits(metrics, before=None):
+    """Ожидание блокировок за замер (без before): число, среднее и верхние границы корзин p95/p99."""
+    h = lock_hist(metrics)
+    if before:
+        h = [a - b for a, b in zip(h, before)]
+    if not h[-2]:
+        return {"count": 0, "mean_ms": 0.0, "p95_le_ms": 0.0, "p99_le_ms": 0.0}
+    count, total = h[-2], h[-1]
+    bounds = list(metrics.BUCKETS) + [math.inf]
+
+    def bucket(p):
+        need, seen = p * count, 0
+        for bound, n in zip(bounds, h):
+            seen += n
+            if seen >= need:
+                return round(bound * 1000, 2) if bound != math.inf else None
+    return {"count": count, "mean_ms": round(total / count * 1000, 3),
+            "p95_le_ms": bucket(0.95), "p99_le_ms": bucket(0.99)}
+
+
+def compare(result, baseline, threshold):
+    problems = []
+    for name, cur in result["commands"].items():
+        old = baseline.get("commands", {}).get(name)
+        if not old:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if old.get(key) and cur.get(key) and cur[key] > old[key] * (1 + threshold):
+                problems.append(f"{name} {key}: {old[key]} -> {cur[key]}")
+    old_rps = baseline.get("throughput_rps")
+    if old_rps and result["throughput_rps"] < old_rps * (1 - threshold):
+        problems.append(f"throughput_rps: {old_rps} -> {result['throughput_rps']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--commands", default="", help="через запятую; по умолчанию все")
+    parser.add_argument("--mode", choices=("queue", "sync"), default="queue")
+    parser.add_argument("--inline", choices=("0", "1"), default="1")
+    parser.add_argument("--workers", type=int, default=4, help="UPDATE_WORKERS")
+    parser.add_argument("--api-latency", type=float, default=0.005, help="задержка поддельного Bot API, с")
+    parser.add_argument("--tg-rate", type=float, default=100000,
+                        help="лимит клиента Bot API (сообщений/с); по умолчанию не мешает замеру")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="")
+    parser.add_argument("--baseline", default="")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    from bench.fake_bot_api import FakeBotAPI
+    api = FakeBotAPI(latency=args.api_latency).start()
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    # окружение до импорта main: config читается один раз
+    os.environ.update(
+        TELEGRAM_API_URL=api.url, BOT_TOKEN="LOADTEST", WEBHOOK_MODE=args.mode, INLINE_REPLIES=args.inline,
+        UPDATE_WORKERS=str(args.workers), SCHEDULER_ENABLED="0", PRELOAD_HANDLERS="0",
+        DB_PATH=os.path.join(tmp, "loadtest.db"), WATER_JOURNAL_DIR=os.path.join(tmp, "journal"),
+        METRICS_DIR=os.path.join(tmp, "metrics"), SCHEDULER_LOCK_PATH=os.path.join(tmp, "scheduler.lock"),
+        TG_GLOBAL_RATE=str(args.tg_rate), TG_CHAT_RATE=str(args.tg_rate), TG_CHAT_BURST="1000",
+    )
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    import requests
+    from werkzeug.serving import make_server
+    import main as bot
+    import metrics
+    from data.recipes import recipes
+
+    server = make_server("127.0.0.1", 0, bot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/webhook"
+
+    full_mix = command_mix([r["key"] for r in recipes])
+    mix = full_mix
+    if args.commands:
+        mix = {k: v for k, v in mix.items() if k in args.commands.split(",")}
+
+    # у каждого клиента свои пользователи и не больше одного апдейта в полёте — ответ Bot API
+    # однозначно сопоставляется с апдейтом по chat_id
+    waiting = {}
+    waiting_lock = threading.Lock()
+
+    def on_call(call):
+        with waiting_lock:
+            event = waiting.pop(call["params"].get("chat_id"), None)
+        if event is not None:
+            event.set()
+
+    api.on_call(on_call)
+
+    latencies = defaultdict(list)
+    acks = defaultdict(list)
+    failures = defaultdict(lambda: defaultdict(int))
+    counter = iter(range(1, 10**9))
+    counter_lock = threading.Lock()
+    per_client = max(1, args.requests // args.concurrency)
+    # прогрев закончен у всех клиентов — начинается замер
+    ready = threading.Barrier(args.concurrency + 1)
+
+    def send(session, user_id, text):
+        """(ack, задержка) в секундах или строка с причиной ошибки."""
+        with counter_lock:
+            update_id = next(counter)
+        body = json.dumps(make_update(update_id, user_id, text))
+        event = threading.Event()
+        with waiting_lock:
+            waiting[user_id] = event
+        started = time.perf_counter()
+        try:
+            resp = session.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=WAIT_TIMEOUT)
+        except requests.RequestException:
+            return "http_error"
+        acked = time.perf_counter() - started
+        if resp.status_code != 200 or resp.headers.get("Content-Type", "").startswith("application/json"):
+            # ошибка или статический ответ прямо в теле webhook
+            with waiting_lock:
+                waiting.pop(user_id, None)
+            return f"http_{resp.status_code}" if resp.status_code != 200 else (acked, acked)
+        if event.wait(WAIT_TIMEOUT):
+            return acked, time.perf_counter() - started
+        with waiting_lock:
+            waiting.pop(user_id, None)
+        return "timeout"
+
+    def client(index):
+        rnd = random.Random(args.seed * 1000 + index)
+        session = requests.Session()
+        users = list(range(1_000_000 + index, 1_000_000 + args.users, args.concurrency)) or [1_000_000 + index]
+        try:
+            # прогрев вне замера: каждый пользователь заполняет профиль — от него зависят /biorhythm и /mealplan
+            for u in users:
+                send(session, u, full_mix["setprofile"](rnd))
+        finally:
+            ready.wait()
+        for _ in range(per_client):
+            user_id, name = rnd.choice(users), rnd.choice(list(mix))
+            result = send(session, user_id, mix[name](rnd))
+            if isinstance(result, str):
+                failures[name][result] += 1
+                continue
+            acks[name].append(result[0])
+            latencies[name].append(result[1])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    locks_before, calls_before = lock_hist(metrics), len(api.calls)
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    completed = sum(len(v) for v in latencies.values())
+    result = {
+        "config": {k: getattr(args, k) for k in ("requests", "concurrency", "users", "mode", "inline", "workers",
+                                                 "api_latency", "seed")},
+        "elapsed_s": round(elapsed, 2),
+        "completed": completed,
+        "failed": sum(sum(f.values()) for f in failures.values()),
+        "throughput_rps": round(completed / elapsed, 1),
+        "commands": {},
+        "sqlite_lock_wait": lock_waits(metrics, locks_before),
+        "outbound_calls": len(api.calls) - calls_before,
+    }
+    all_samples = []
+    for name in mix:
+        stats = summarize(latencies[name])
+        stats["webhook_ack_p50_ms"] = summarize(acks[name])["p50_ms"]
+        if failures[name]:
+            stats["failures"] = dict(failures[name])
+        result["commands"][name] = stats
+        all_samples += latencies[name]
+    result["overall"] = summarize(all_samples)
+
+    server.shutdown()
+    api.stop()
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print(f"Внимание: параметры прогона отличаются от {args.baseline}: {baseline.get('config')}",
+                  file=sys.stderr)
+        problems = compare(result, baseline, args.threshold)
+        if problems:
+            print("Регрессия относительно " + args.baseline + ":\n  " + "\n  ".join(problems), file=sys.stderr)
+            sys.exit(1)
+        print(f"Без регрессий относительно {args.baseline} (порог {args.threshold:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
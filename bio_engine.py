@@ -0,0 +1,34 @@
+from datetime import date
+import numpy as np
+
+# Циклы периодичны, поэтому значения считаем один раз на каждую фазу, дальше — только индексация
+CYCLES = (("physical", 23), ("emotional", 28), ("intellectual", 33))
+PERIODS = np.array([p for _, p in CYCLES])
+TABLES = tuple(np.round(100 * np.sin(2 * np.pi * np.arange(p) / p), 2) for _, p in CYCLES)
+
+
+def _values(offsets):
+    """offsets — дни от рождения (любой формы); результат: (3, *offsets.shape)."""
+    return np.stack([table[offsets % p] for table, p in zip(TABLES, PERIODS)])
+
+
+def forecast(birth, start, days):
+    """Прогноз на days дней начиная со start: массив (3, days) в процентах."""
+    offsets = (start.toordinal() - birth.toordinal()) + np.arange(days)
+    return _values(offsets)
+
+
+def critical_days(birth, start, days):
+    """Критические дни — переход цикла через ноль: маска (3, days).
+
+    День критический, если значение в нём равно нулю или знак меняется к следующему дню.
+    """
+    offsets = (start.toordinal() - birth.toordinal()) + np.arange(days + 1)
+    signs = np.sign(_values(offsets))
+    return (signs[:, :-1] == 0) | (signs[:, :-1] * signs[:, 1:] < 0)
+
+
+def today_batch(birth_ordinals, today=None):
+    """Значения на сегодня для массива дат рождения (date.toordinal()): массив (3, n)."""
+    today = today or date.today()
+    return _values(today.toordinal() - np.asarray(birth_ordinals, dtype=np.int64))
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from data.challenges import challenges as DEFINITIONS
+from db import get_conn, shards, transaction
+from water_series import JULIAN_OFFSET, day_total, ordinal
+
+# Прогресс считается при записи: каждая пачка воды из water_buffer в той же транзакции
+# двигает day_value активных челленджей, а пересечение дневной нормы сразу даёт +1 к
+# progress и streak. Раз в сутки rollover() одним UPDATE на шард закрывает вчерашний день.
+# credited_day — день, за который норма уже засчитана: один день даёт не больше одного +1.
+# Вода за уже закрытый день (сброс через полночь, повтор после блокировки, журнал упавшего
+# воркера) идёт через LATE_SQL: день засчитывается задним числом, серия пересчитывается по water_days.
+
+# значение за день до прибавки: если last_day — прошлый день, день начинается с нуля
+_CUR = "(CASE WHEN last_day = :day THEN day_value ELSE 0 END)"
+_CROSSED = f"(credited_day IS NOT :day AND {_CUR} + :amount >= goal)"
+# серия сохраняется, если это тот же день или вчерашняя норма засчитана
+_STREAK = f"(CASE WHEN last_day = :day OR credited_day = :prev THEN streak ELSE 0 END + {_CROSSED})"
+
+APPLY_SQL = f"""
+UPDATE challenges SET
+    status = CASE WHEN {_STREAK} >= days THEN 'done' ELSE status END,
+    streak = {_STREAK},
+    progress = progress + {_CROSSED},
+    credited_day = CASE WHEN {_CROSSED} THEN :day ELSE credited_day END,
+    day_value = {_CUR} + :amount,
+    last_day = :day
+WHERE tg_id = :tg_id AND metric = :metric AND status = 'active' AND last_day <= :day
+"""
+
+# поздняя прибавка впервые довела день до нормы; water_days за него уже обновлён в этой транзакции
+# (пока метрика одна — вода)
+_LATE_TOTAL = "(SELECT amount_ml FROM water_days WHERE tg_id = :tg_id AND day = :ord)"
+_LATE_CROSSED = (f"(:day >= start_day AND credited_day IS NOT :day "
+                 f"AND {_LATE_TOTAL} >= goal AND {_LATE_TOTAL} - :amount < goal)")
+# серия: дни подряд с нормой, закончившиеся вчера относительно last_day, плюс last_day, если он засчитан
+_LATE_MET = "(SELECT amount_ml >= goal FROM water_days WHERE tg_id = :tg_id AND day = run.day)"
+_START = f"CAST(julianday(start_day) - {JULIAN_OFFSET} AS INTEGER)"
+_LATE_RUN = f"""(WITH RECURSIVE run(day) AS (
+        SELECT CAST(julianday(last_day) - {JULIAN_OFFSET} AS INTEGER) - 1
+        UNION ALL
+        SELECT run.day - 1 FROM run WHERE {_LATE_MET} AND run.day > {_START})
+    SELECT COUNT(*) FROM run WHERE {_LATE_MET} AND run.day >= {_START})"""
+_LATE_STREAK = f"({_LATE_RUN} + (credited_day IS last_day))"
+
+LATE_SQL = f"""
+UPDATE challenges SET
+    status = CASE WHEN {_LATE_STREAK} >= days THEN 'done' ELSE status END,
+    streak = {_LATE_STREAK},
+    progress = progress + 1,
+    credited_day = CASE WHEN credited_day > :day THEN credited_day ELSE :day END
+WHERE tg_id = :tg_id AND metric = :metric AND status = 'active' AND last_day > :day AND {_LATE_CROSSED}
+"""
+
+ROLLOVER_SQL = """
+UPDATE challenges SET
+    streak = CASE WHEN credited_day = :yesterday THEN streak ELSE 0 END,
+    day_value = 0,
+    last_day = :today
+WHERE status = 'active' AND last_day < :today
+"""
+
+STATUS_SQL = ("SELECT challenge, last_day, day_value, streak, progress, goal, days, status, start_day, credited_day "
+              "FROM challenges WHERE tg_id = ?")
+
+
+def _prev(day):
+    return (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+def apply(cur, metric, increments):
+    """Прибавки [(tg_id, day, amount)] к челленджам с этой метрикой; вызывается внутри транзакции записи."""
+    params = [
+        {"tg_id": tg_id, "day": day, "prev": _prev(day), "ord": ordinal(day), "amount": amount, "metric": metric}
+        for tg_id, day, amount in increments
+    ]
+    cur.executemany(APPLY_SQL, params)
+    # условия last_day <= :day и last_day > :day не пересекаются: каждая прибавка проходит один из путей
+    cur.executemany(LATE_SQL, params)
+
+
+def rollover(today=None):
+    """Закрывает прошедшие дни у всех активных участников одним проходом. Повторный вызов ничего не меняет."""
+    today = today or date.today()
+    params = {"today": today.isoformat(), "yesterday": (today - timedelta(days=1)).isoformat()}
+    rolled = 0
+    for shard in shards():
+        with transaction(shard=shard) as cur:
+            cur.execute(ROLLOVER_SQL, params)
+            rolled += cur.rowcount
+    return rolled
+
+
+def join(tg_id, key, today=None):
+    """Начинает челлендж заново. Уже записанная за сегодня вода засчитывается. False — уже участвует."""
+    d = DEFINITIONS[key]
+    today = (today or date.today()).isoformat()
+    with transaction(tg_id) as cur:
+        r = cur.execute("SELECT status FROM challenges WHERE tg_id=? AND challenge=?", (tg_id, key)).fetchone()
+        if r and r[0] == "active":
+            return False
+        value = day_total(tg_id, today, cur)
+        met = int(value >= d["goal"])
+        cur.execute(
+            "INSERT OR REPLACE INTO challenges (tg_id, challenge, start_day, progress, streak, metric, goal, days, "
+            "last_day, day_value, status, credited_day) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tg_id, key, today, met, met, d["metric"], d["goal"], d["days"], today, value,
+             "done" if met >= d["days"] else "active", today if met else None))
+    return True
+
+
+def leave(tg_id, key):
+    with transaction(tg_id) as cur:
+        cur.execute("DELETE FROM challenges WHERE tg_id=? AND challenge=?", (tg_id, key))
+        return cur.rowcount > 0
+
+
+def rows(tg_id):
+    return get_conn(tg_id).execute(STATUS_SQL, (tg_id,)).fetchall()
+
+
+def effective(row, today, pending=0):
+    """(streak, progress, сегодня, status) с учётом ещё не закрытых дней и несброшенной воды —
+    то же, что дали бы rollover() и APPLY_SQL."""
+    _, last_day, value, streak, progress, goal, days, status, _, credited = row
+    if status != "active":
+        return streak, progress, 0, status
+    today = today.isoformat()
+    if last_day == today:
+        cur = value
+    else:
+        cur = 0
+        if credited != _prev(today):
+            streak = 0
+    crossed = int(credited != today and cur + pending >= goal)
+    streak += crossed
+    return streak, progress + crossed, cur + pending, "done" if streak >= days else status
@@ -1,4 +1,73 @@
 import os
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
+BOT_TOKEN = os.getenv("BOT_TOKEN") or os.getenv("TELEGRAM_TOKEN")
 PORT = int(os.getenv("PORT", 5000))
+
+# Приём апдейтов: queue — webhook кладёт апдейт в очередь и сразу отвечает 200,
+# sync — обработка прямо в запросе (как раньше)
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "queue")
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 4))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+# reject — вернуть Telegram 503 (он повторит доставку), drop — ответить 200 и выбросить апдейт
+UPDATE_QUEUE_OVERFLOW = os.getenv("UPDATE_QUEUE_OVERFLOW", "reject")
+UPDATE_DRAIN_TIMEOUT = float(os.getenv("UPDATE_DRAIN_TIMEOUT", 10))
+HANDLER_TIMEOUT = float(os.getenv("HANDLER_TIMEOUT", 30))
+# повторные доставки одного update_id отбрасываются; помним последние UPDATE_DEDUP_WINDOW номеров
+UPDATE_DEDUP_WINDOW = int(os.getenv("UPDATE_DEDUP_WINDOW", 100000))
+UPDATE_DEDUP_CACHE = int(os.getenv("UPDATE_DEDUP_CACHE", 10000))
+# 1 — после старта догрузить все обработчики в фоне; 0 — только при первом вызове команды
+PRELOAD_HANDLERS = os.getenv("PRELOAD_HANDLERS", "0") == "1"
+
+# SQLite
+DB_PATH = os.getenv("DB_PATH", "liferhythm.db")
+# Данные пользователей (users, water_days, challenges) делятся на DB_SHARDS файлов по хэшу tg_id;
+# 1 — всё в одном файле DB_PATH. Сменить число шардов на живой БД — tools/reshard.py
+DB_SHARDS = int(os.getenv("DB_SHARDS", 1))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 64 * 1024 * 1024))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", 128))
+
+# Буфер /water: прибавки копятся в памяти и пишутся пачкой
+WATER_FLUSH_SIZE = int(os.getenv("WATER_FLUSH_SIZE", 500))
+WATER_FLUSH_INTERVAL = float(os.getenv("WATER_FLUSH_INTERVAL", 2))
+WATER_JOURNAL_DIR = os.getenv("WATER_JOURNAL_DIR", "water_journal")  # пусто — без журнала
+
+# Кэш профилей: ~250 байт на запись, 200 тыс. записей — около 50 МБ на воркер
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 200000))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 300))
+
+# Статические команды отвечают прямо в теле ответа webhook
+INLINE_REPLIES = os.getenv("INLINE_REPLIES", "1") == "1"
+
+# Исходящие вызовы Bot API
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 30))  # сообщений в секунду на бота
+# сколько процессов шлют сообщения (воркеры gunicorn): TG_GLOBAL_RATE делится между ними
+TG_PROCESSES = int(os.getenv("TG_PROCESSES") or os.getenv("WEB_CONCURRENCY") or 1)
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", 1))  # сообщений в секунду в один чат
+TG_CHAT_BURST = int(os.getenv("TG_CHAT_BURST", 3))
+TG_POOL_SIZE = int(os.getenv("TG_POOL_SIZE", 16))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", 5))
+TG_TIMEOUT = float(os.getenv("TG_TIMEOUT", 10))
+TG_SENDERS = int(os.getenv("TG_SENDERS", 4))
+TG_MAX_PENDING = int(os.getenv("TG_MAX_PENDING", 10000))
+
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+
+# Планировщик напоминаний и рассылок
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", "scheduler.lock")
+SCHEDULER_PAGE = int(os.getenv("SCHEDULER_PAGE", 1000))
+DEFAULT_TZ = os.getenv("DEFAULT_TZ", "Europe/Moscow")
+DAILY_HOUR = int(os.getenv("DAILY_HOUR", 9))  # местное время пользователя
+WATER_REMINDER_HOUR = int(os.getenv("WATER_REMINDER_HOUR", 14))
+WATER_GOAL_ML = int(os.getenv("WATER_GOAL_ML", 2000))
+
+# Метрики: снимки воркеров складываются в каталог и суммируются на /metrics
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+
+# Журнал событий (таблица logs) и дневные сводки для /stats
+EVENTS_FLUSH_SIZE = int(os.getenv("EVENTS_FLUSH_SIZE", 1000))
+EVENTS_FLUSH_INTERVAL = float(os.getenv("EVENTS_FLUSH_INTERVAL", 5))
+EVENTS_RETENTION_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", 30))  # сырые события; сводки хранятся всегда
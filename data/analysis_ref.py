@@ -1,6 +1,7 @@
 analysis_ref = {
     "hemoglobin": {
         "name": "Гемоглобин",
+        "aliases": ["гемоглобин", "hb", "hgb", "haemoglobin"],
         "norm_m": "130-170 г/л",
         "norm_f": "120-150 г/л",
         "what": "Белок, переносит кислород. Низкий — анемия.",
@@ -8,8 +9,23 @@ analysis_ref = {
     },
     "ALT": {
         "name": "ALT",
+        "aliases": ["алт", "алат", "аланинаминотрансфераза", "alat", "gpt"],
         "norm": "до 40 Ед/л",
         "what": "Показатель функции печени.",
         "advice": "Повышение требует обследования."
+    },
+    "AST": {
+        "name": "AST",
+        "aliases": ["аст", "асат", "аспартатаминотрансфераза", "asat", "got"],
+        "norm": "до 40 Ед/л",
+        "what": "Фермент печени и сердечной мышцы.",
+        "advice": "Оценивается вместе с ALT. Повышение требует обследования."
+    },
+    "glucose": {
+        "name": "Глюкоза",
+        "aliases": ["глюкоза", "сахар", "glu", "sugar"],
+        "norm": "3,3-5,5 ммоль/л",
+        "what": "Уровень сахара в крови натощак.",
+        "advice": "Сдавайте натощак. Повышение — повод проверить гликированный гемоглобин."
     }
 }
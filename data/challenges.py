@@ -0,0 +1,22 @@
+# metric — что засчитывается (пока только вода, мл за день), goal — дневная норма,
+# days — сколько дней подряд нужно выполнить норму
+challenges = {
+    "water7": {
+        "title": "Водный 7 дней",
+        "metric": "water",
+        "goal": 2000,
+        "days": 7,
+    },
+    "water21": {
+        "title": "Водная привычка 21 день",
+        "metric": "water",
+        "goal": 1500,
+        "days": 21,
+    },
+    "water30": {
+        "title": "Водный месяц",
+        "metric": "water",
+        "goal": 2500,
+        "days": 30,
+    },
+}
@@ -0,0 +1,16 @@
+motivation = [
+    "Маленькие шаги каждый день дают большие результаты.",
+    "Стакан воды утром — простой способ начать день с заботы о себе.",
+    "Не нужно быть идеальным, нужно быть последовательным.",
+    "Движение — это жизнь. Даже 10 минут прогулки лучше, чем ничего.",
+    "Сон — не потеря времени, а вклад в завтрашний день.",
+    "Благодарность превращает то, что у нас есть, в достаточно.",
+    "Привычка сильнее мотивации: сделай сегодня хотя бы минимум.",
+    "Дыши глубже: три медленных вдоха снимают напряжение.",
+    "Лучшее время начать было вчера. Следующее лучшее — сейчас.",
+    "Заботься о теле — это единственное место, где тебе предстоит жить.",
+    "Отдых — часть плана, а не отступление от него.",
+    "Сравнивай себя только с собой вчерашним.",
+    "Одна полезная тарелка еды — уже победа.",
+    "Спокойствие — это навык. Тренируй его каждый день.",
+]
@@ -0,0 +1,84 @@
+# --- Главное меню ---
+main_menu = (
+    "🌿 Добро пожаловать в *LifeRhythm Bot*!\n\n"
+    "Этот бот поможет тебе на пути к гармоничной жизни: здоровье, развитие, "
+    "баланс и осознанность.\n\n"
+    "📌 Выбери интересующий раздел:\n\n"
+    "1️⃣ /health — Здоровье\n"
+    "2️⃣ /mind — Развитие ума\n"
+    "3️⃣ /soul — Душа и эмоции\n"
+    "4️⃣ /productivity — Продуктивность\n"
+    "5️⃣ /lifestyle — Образ жизни\n"
+    "6️⃣ /practices — Практики и упражнения\n"
+    "7️⃣ /resources — Полезные ресурсы\n"
+)
+
+# --- Ответы по разделам ---
+sections = {
+    "health": (
+        "🏥 *Здоровье*\n\n"
+        "Здоровье — фундамент гармоничной жизни. Несколько направлений:\n\n"
+        "• Питание: соблюдай баланс белков, жиров и углеводов.\n"
+        "• Вода: 1.5–2 л чистой воды в день.\n"
+        "• Сон: 7–9 часов качественного сна.\n"
+        "• Движение: хотя бы 30 минут активности ежедневно.\n\n"
+        "👉 Практика: введи привычку *утренней зарядки* на 5–10 минут."
+    ),
+    "mind": (
+        "🧠 *Развитие ума*\n\n"
+        "Развитие ума помогает поддерживать ясность и уверенность.\n\n"
+        "• Чтение книг каждый день.\n"
+        "• Обучение новым навыкам.\n"
+        "• Ведение дневника идей.\n"
+        "• Решение логических задач.\n\n"
+        "👉 Практика: заведи правило *30 минут чтения* каждый вечер."
+    ),
+    "soul": (
+        "💖 *Душа и эмоции*\n\n"
+        "Внутреннее состояние определяет качество жизни.\n\n"
+        "• Практикуй благодарность.\n"
+        "• Обращай внимание на дыхание.\n"
+        "• Находи время для тишины.\n"
+        "• Разговаривай с близкими.\n\n"
+        "👉 Практика: каждый вечер записывай *3 вещи*, за которые благодарен."
+    ),
+    "productivity": (
+        "📅 *Продуктивность*\n\n"
+        "Правильная организация времени — ключ к успеху.\n\n"
+        "• Используй технику Pomodoro (25 мин работа / 5 мин отдых).\n"
+        "• Планируй день вечером.\n"
+        "• Убирай отвлекающие факторы.\n"
+        "• Разделяй важное и срочное.\n\n"
+        "👉 Практика: начни день с *трёх главных задач*."
+    ),
+    "lifestyle": (
+        "🌍 *Образ жизни*\n\n"
+        "Здоровый образ жизни формируется из привычек.\n\n"
+        "• Старайся больше двигаться.\n"
+        "• Минимизируй стресс.\n"
+        "• Проводите время на свежем воздухе.\n"
+        "• Поддерживай социальные связи.\n\n"
+        "👉 Практика: добавь *ежедневную прогулку* 20–30 минут."
+    ),
+    "practices": (
+        "🧘 *Практики и упражнения*\n\n"
+        "Простые практики для баланса:\n\n"
+        "• Медитация 5–10 минут.\n"
+        "• Утренняя разминка.\n"
+        "• Дыхательные упражнения.\n"
+        "• Практика осознанности (наблюдай за собой).\n\n"
+        "👉 Выбери то, что ближе, и начни с малого."
+    ),
+    "resources": (
+        "📚 *Полезные ресурсы*\n\n"
+        "Книги:\n"
+        "• 'Сила настоящего' — Экхарт Толле\n"
+        "• '7 навыков высокоэффективных людей' — Стивен Кови\n"
+        "• 'Атомные привычки' — Джеймс Клир\n\n"
+        "Приложения:\n"
+        "• Headspace — медитации\n"
+        "• Notion — организация задач\n"
+        "• Habitica — развитие привычек\n\n"
+        "👉 Используй их для укрепления гармонии."
+    ),
+}
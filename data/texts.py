@@ -0,0 +1,27 @@
+yoga = "🧘 Утренняя растяжка:\n1) Наклоны головы 30 сек\n2) Кошка-корова 1 мин\n3) Наклон вперед 1 мин\n4) Савасана 1 мин"
+
+meditation = (
+    "💨 Дыхание 4-4-4:\n"
+    "Вдох 4 сек — Задержка 4 сек — Выдох 4 сек. Повтори 6–8 циклов.\n"
+    "Также можно 4-6 минут медитации лежа."
+)
+
+help_text = (
+    "📌 Список команд:\n"
+    "/start — главное меню\n"
+    "/help — справка\n"
+    "/profile — показать профиль, /setprofile sex=m age=30 ... — задать\n"
+    "/biorhythm [YYYY-MM-DD] [дней] — биоритм и прогноз\n"
+    "/nutrition — рецепты, /recipe <ключ> — рецепт целиком\n"
+    "/recipes [ингредиенты] [kcal<=500 белок>=30] — поиск рецептов\n"
+    "/mealplan — план питания на день по профилю\n"
+    "/exercise [цель] — упражнения\n"
+    "/yoga — йога/растяжка\n"
+    "/meditation — дыхание\n"
+    "/analysis [param] или hemoglobin=118 ALT=55 — расшифровка анализов\n"
+    "/water [ml] — отметить воду (например /water 250), /water status — итог за день\n"
+    "/water week|month|year — история воды\n"
+    "/challenges — челленджи\n"
+    "/daily — мотивация дня\n"
+    "/remind on|off — ежедневные напоминания"
+)
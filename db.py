@@ -1,11 +1,196 @@
+import logging
+import os
 import sqlite3
-from config import DB_PATH
-from contextlib import closing
+import threading
+import time
+import weakref
+import metrics
+from config import DB_PATH, DB_SHARDS, DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_STATEMENT_CACHE
+from contextlib import closing, contextmanager
 
-def init_db():
-    with closing(sqlite3.connect(DB_PATH)) as conn:
-        cur = conn.cursor()
-        cur.executescript("""
+logger = logging.getLogger(__name__)
+
+# Одно соединение на поток и файл: открывается при первом обращении и закрывается, когда поток
+# завершается (потоки запросов Flask короткие — держать их соединения нельзя).
+# Несколько воркеров gunicorn пишут в одни файлы — это держит WAL + busy_timeout.
+#
+# Файлы: DB_PATH — общие таблицы (журнал событий, сводки, рассылки, контрольные точки);
+# данные пользователей (users, water_days, challenges, processed_updates) — в шарде по tg_id.
+# Транзакция всегда в пределах одного файла, поэтому воркеры, пишущие разным
+# пользователям, не ждут одну блокировку записи. При DB_SHARDS=1 шард — сам DB_PATH.
+_local = threading.local()
+_all_conns = weakref.WeakSet()
+_all_lock = threading.Lock()
+_generation = 0
+_inherited = []
+
+
+class TimedCursor(sqlite3.Cursor):
+    # время запросов идёт в разбивку текущей команды (metrics.command_latency_seconds{part="db"})
+    def execute(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            metrics.add_db(time.perf_counter() - started)
+
+    def executemany(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            metrics.add_db(time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+
+def shard_of(tg_id, shards=None):
+    # мультипликативный хэш Кнута: шард берётся из старших бит 32-битного произведения
+    # (младшие у степеней двойки повторяли бы tg_id % shards), соседние tg_id расходятся
+    return ((int(tg_id) * 2654435761) & 0xFFFFFFFF) * (shards or DB_SHARDS) >> 32
+
+
+def shard_path(shard, shards=None, base=None):
+    shards = shards or DB_SHARDS
+    base = base or DB_PATH
+    if shards == 1:
+        return base
+    root, ext = os.path.splitext(base)
+    # число шардов в имени: после решардинга старые и новые файлы не пересекаются
+    return f"{root}-s{shard}of{shards}{ext or '.db'}"
+
+
+def shards():
+    return range(DB_SHARDS)
+
+
+def _path(tg_id=None, shard=None):
+    if shard is None and tg_id is not None:
+        shard = shard_of(tg_id)
+    return DB_PATH if shard is None else shard_path(shard)
+
+
+def _connect(path=DB_PATH):
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # транзакциями управляем сами, см. transaction()
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE,
+        factory=TimedConnection,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    return conn
+
+
+class _ThreadConns:
+    # держит соединения потока; threading.local отпускает его при выходе потока
+    def __init__(self):
+        self.pid = os.getpid()
+        self.generation = _generation
+        self.conns = {}
+        # при выходе процесса не закрываем: atexit-обработчики (сброс воды) ещё пишут в БД
+        weakref.finalize(self, _close, self.pid, self.conns).atexit = False
+
+
+def _close(pid, conns):
+    # соединения, унаследованные через fork, не закрываем: close() в потомке
+    # может устроить checkpoint и удалить WAL под родителем
+    if pid != os.getpid():
+        return
+    for conn in conns.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def get_conn(tg_id=None, shard=None):
+    """Соединение текущего потока: с шардом пользователя tg_id (или шардом shard),
+    без аргументов — с общей БД. Закрывать его не нужно."""
+    holder = getattr(_local, "holder", None)
+    # после fork соединения родителя использовать нельзя
+    if holder is None or holder.pid != os.getpid() or holder.generation != _generation:
+        if holder is not None and holder.pid != os.getpid():
+            _inherited.append(holder)  # см. _close
+        holder = _local.holder = _ThreadConns()
+    conns = holder.conns
+    path = _path(tg_id, shard)
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+        with _all_lock:
+            _all_conns.add(conn)
+    return conn
+
+
+def scatter(sql, params=()):
+    """Один запрос ко всем шардам; строки по шардам подряд. Для админских сводок и обходов."""
+    for shard in shards():
+        yield from get_conn(shard=shard).execute(sql, params)
+
+
+@contextmanager
+def transaction(tg_id=None, shard=None):
+    """Пишущая транзакция в шарде пользователя tg_id (шарде shard) или в общей БД.
+
+    BEGIN IMMEDIATE сразу берёт блокировку записи, поэтому параллельные воркеры ждут
+    busy_timeout, а не падают на апгрейде блокировки. Вложенный вызов в тот же файл
+    работает через SAVEPOINT."""
+    conn = get_conn(tg_id, shard)
+    if shard is None and tg_id is not None:
+        shard = shard_of(tg_id)
+    cur = conn.cursor()
+    if conn.in_transaction:
+        cur.execute("SAVEPOINT nested")
+        try:
+            yield cur
+        except BaseException:
+            cur.execute("ROLLBACK TO nested")
+            cur.execute("RELEASE nested")
+            raise
+        else:
+            cur.execute("RELEASE nested")
+        return
+    started = time.perf_counter()
+    cur.execute("BEGIN IMMEDIATE")
+    metrics.observe("db_lock_wait_seconds", (("db", "main" if shard is None else f"shard{shard}"),),
+                    time.perf_counter() - started)
+    try:
+        yield cur
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_all():
+    global _generation
+    with _all_lock:
+        conns = list(_all_conns)
+        _all_conns.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+SHARD_SCHEMA = """
         CREATE TABLE IF NOT EXISTS users (
             tg_id INTEGER PRIMARY KEY,
             first_name TEXT,
@@ -16,30 +201,184 @@ def init_db():
             height_cm REAL,
             weight_kg REAL,
             goal TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            birth_date TEXT,
+            tz TEXT,
+            notify INTEGER DEFAULT 0
         );
-        CREATE TABLE IF NOT EXISTS water (
+        -- day — date.toordinal(); строки пользователя лежат подряд в кластерном ключе (см. water_series.py)
+        CREATE TABLE IF NOT EXISTS water_days (
             tg_id INTEGER,
-            day TEXT,
+            day INTEGER,
             amount_ml INTEGER,
             PRIMARY KEY (tg_id, day)
-        );
+        ) WITHOUT ROWID;
         CREATE TABLE IF NOT EXISTS challenges (
             tg_id INTEGER,
             challenge TEXT,
             start_day TEXT,
             progress INTEGER,
             streak INTEGER,
+            metric TEXT,
+            goal INTEGER,
+            days INTEGER,
+            last_day TEXT,
+            day_value INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'active',
+            credited_day TEXT,
             PRIMARY KEY (tg_id, challenge)
         );
+        -- номера уже принятых апдейтов: повторная доставка webhook не обрабатывается дважды
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            update_id INTEGER PRIMARY KEY
+        ) WITHOUT ROWID;
+        -- последний записанный в этот шард сегмент журнала воды каждого процесса (water_buffer.py):
+        -- повтор журнала после падения пропускает шарды, куда сегмент уже попал
+        CREATE TABLE IF NOT EXISTS water_applied (
+            writer TEXT PRIMARY KEY,
+            seq INTEGER,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+"""
+
+GLOBAL_SCHEMA = """
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             tg_id INTEGER,
             event TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            key TEXT,
+            value INTEGER,
+            day TEXT
         );
-        """)
-        conn.commit()
+        -- дневные сводки по журналу событий, обновляются при записи пачки (events.py)
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT,
+            metric TEXT,
+            key TEXT DEFAULT '',
+            value INTEGER DEFAULT 0,
+            PRIMARY KEY (day, metric, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS daily_users (
+            day TEXT,
+            tg_id INTEGER,
+            PRIMARY KEY (day, tg_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS totals (
+            metric TEXT PRIMARY KEY,
+            value INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT,
+            created_by INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            done INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_tg_id INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            done INTEGER DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+"""
+
+SHARDED_TABLES = ("users", "water_days", "challenges", "processed_updates", "water_applied")
+
+
+def init_db():
+    for shard in shards():
+        init_shard(shard_path(shard))
+    with _schema(DB_PATH, GLOBAL_SCHEMA) as cur:
+        # колонки, появившиеся позже: старые БД догоняем ALTER TABLE
+        _add_column(cur, "logs", "key", "TEXT")
+        _add_column(cur, "logs", "value", "INTEGER")
+        _add_column(cur, "logs", "day", "TEXT")
+        # старые события удаляются по дню
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_day ON logs (day)")
+        if DB_SHARDS > 1 and _count(DB_PATH):
+            logger.warning("В %s остались пользователи, а DB_SHARDS=%s: они не видны боту, "
+                           "перенесите их: python -m tools.reshard --shards %s --from-shards 1",
+                           DB_PATH, DB_SHARDS, DB_SHARDS)
+        if not cur.execute("SELECT 1 FROM totals WHERE metric = 'users'").fetchone():
+            # счётчик пользователей дальше ведётся инкрементально; стартуем с текущего числа строк
+            users = sum(_count(shard_path(shard)) for shard in shards())
+            cur.execute("INSERT INTO totals (metric, value) VALUES ('users', ?)", (users,))
+
+
+def init_shard(path):
+    with _schema(path, SHARD_SCHEMA) as cur:
+        _add_column(cur, "users", "birth_date", "TEXT")
+        _add_column(cur, "users", "tz", "TEXT")
+        # в старых файлах колонка осталась с DEFAULT 1, поэтому INSERT в users задают notify явно
+        _add_column(cur, "users", "notify", "INTEGER DEFAULT 0")
+        if cur.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # напоминания приходили всем по умолчанию; явное /remind on от этого не отличить,
+            # поэтому выключаем всем — подписка заново через /remind on
+            cur.execute("UPDATE users SET notify = 0")
+            cur.execute("PRAGMA user_version = 1")
+        _add_column(cur, "challenges", "metric", "TEXT")
+        _add_column(cur, "challenges", "goal", "INTEGER")
+        _add_column(cur, "challenges", "days", "INTEGER")
+        _add_column(cur, "challenges", "last_day", "TEXT")
+        _add_column(cur, "challenges", "day_value", "INTEGER DEFAULT 0")
+        _add_column(cur, "challenges", "status", "TEXT DEFAULT 'active'")
+        if _add_column(cur, "challenges", "credited_day", "TEXT"):
+            # раньше засчитанный день определялся по day_value; переносим его в новую колонку
+            cur.execute("UPDATE challenges SET credited_day = last_day WHERE day_value >= goal")
+        _migrate_water(cur)
+        # рассылки идут по часовым поясам постранично по tg_id
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_tz ON users (tz, tg_id)")
+
+
+@contextmanager
+def _schema(path, script):
+    """Создание таблиц и миграции при старте.
+
+    Воркеры gunicorn стартуют одновременно, поэтому миграции идут в одной транзакции
+    BEGIN IMMEDIATE: проверка PRAGMA table_info и ALTER TABLE выполняются уже под
+    блокировкой записи и видят изменения воркера, который успел раньше."""
+    with closing(sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)) as conn:
+        # WAL хранится в самом файле БД — достаточно включить один раз
+        conn.execute("PRAGMA journal_mode=WAL")
+        # CREATE ... IF NOT EXISTS атомарен сам по себе; executescript нельзя вызывать внутри транзакции
+        conn.executescript(script)
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+        except BaseException:
+            conn.rollback()
+            raise
+        cur.execute("COMMIT")
+
+
+def _count(path):
+    with closing(sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000)) as conn:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='users'").fetchone():
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+def _migrate_water(cur):
+    """Старая таблица water (day TEXT, rowid + отдельный индекс PK) переносится в water_days.
+    Вызывается внутри транзакции _schema."""
+    if not cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='water'").fetchone():
+        return
+    # julianday(day) - 1721424.5 == date.toordinal(); SUM — на случай дублей дня в разном написании
+    cur.execute("""
+        INSERT INTO water_days (tg_id, day, amount_ml)
+        SELECT tg_id, CAST(julianday(day) - 1721424.5 AS INTEGER) AS d, SUM(amount_ml) FROM water
+        WHERE julianday(day) IS NOT NULL GROUP BY tg_id, d
+        ON CONFLICT(tg_id, day) DO UPDATE SET amount_ml = amount_ml + excluded.amount_ml
+    """)
+    cur.execute("DROP TABLE water")
+
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+def _add_column(cur, table, column, decl):
+    columns = {r[1] for r in cur.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+    return False
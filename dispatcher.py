@@ -0,0 +1,108 @@
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import metrics
+from config import HANDLER_TIMEOUT
+from static_replies import parse_command
+from tg_types import Context
+
+logger = logging.getLogger(__name__)
+
+# команда -> "модуль:функция"; модуль (и его справочники из data/) импортируется при первом вызове
+HANDLERS = {
+    "start": "handlers.sections:menu",
+    "help": "handlers.help:help_command",
+    "health": "handlers.sections:section",
+    "mind": "handlers.sections:section",
+    "soul": "handlers.sections:section",
+    "productivity": "handlers.sections:section",
+    "lifestyle": "handlers.sections:section",
+    "practices": "handlers.sections:section",
+    "resources": "handlers.sections:section",
+    "profile": "handlers.profile:profile",
+    "setprofile": "handlers.profile:setprofile",
+    "biorhythm": "handlers.biorhythm:biorhythm",
+    "nutrition": "handlers.nutrition:nutrition",
+    "recipe": "handlers.nutrition:recipe",
+    "recipes": "handlers.nutrition:recipes_search",
+    "mealplan": "handlers.nutrition:mealplan",
+    "exercise": "handlers.exercise:exercise",
+    "yoga": "handlers.yoga:yoga",
+    "meditation": "handlers.meditation:meditation",
+    "analysis": "handlers.analysis:analysis",
+    "challenges": "handlers.challenges:challenges",
+    "challenge": "handlers.challenges:challenge",
+    "water": "handlers.challenges:water",
+    "daily": "handlers.daily:daily",
+    "remind": "handlers.daily:remind",
+    "stats": "handlers.admin:admin_stats",
+    "broadcast": "handlers.admin:broadcast",
+}
+
+
+class Dispatcher:
+    """Маршрутизация команд по таблице и выполнение async-обработчиков.
+
+    Обработчик выполняется целиком в потоке, который вызвал dispatch (воркер очереди), на
+    собственном цикле этого потока: запросы к SQLite блокируют только этот воркер, а не
+    остальные чаты. Порядок сообщений одного чата сохраняет очередь; ввод-вывод Bot API
+    reply_text уносит в пул потоков цикла.
+    """
+
+    def __init__(self, handlers=HANDLERS, timeout=HANDLER_TIMEOUT):
+        self.handlers = dict(handlers)
+        self.timeout = timeout
+        self._resolved = {}
+        self._local = threading.local()
+
+    def resolve(self, command):
+        fn = self._resolved.get(command)
+        if fn is None:
+            spec = self.handlers.get(command)
+            if spec is None:
+                return None
+            module, attr = spec.split(":")
+            fn = metrics.instrument(command)(getattr(importlib.import_module(module), attr))
+            self._resolved[command] = fn
+        return fn
+
+    def preload(self):
+        for command in self.handlers:
+            try:
+                self.resolve(command)
+            except Exception:
+                logger.exception("Не удалось загрузить обработчик /%s", command)
+
+    def loop(self):
+        loop = getattr(self._local, "loop", None)
+        # после fork цикл родителя (и его пул потоков) в дочернем процессе не работает
+        if loop is None or self._local.pid != os.getpid():
+            loop = self._local.loop = asyncio.new_event_loop()
+            self._local.pid = os.getpid()
+        return loop
+
+    def dispatch(self, update):
+        """Выполняет обработчик команды. False — апдейт не команда или команда неизвестна."""
+        message = update.message
+        if message is None:
+            return False
+        parsed = parse_command(message.text)
+        if parsed is None:
+            return False
+        command = parsed[0].lower()
+        handler = self.resolve(command)
+        if handler is None:
+            return False
+        context = Context(message.text.split()[1:])
+        try:
+            self.loop().run_until_complete(asyncio.wait_for(handler(update, context), self.timeout))
+        except asyncio.TimeoutError:
+            logger.error("Обработчик /%s не уложился в %s с", command, self.timeout)
+        except Exception:
+            logger.exception("Ошибка в обработчике /%s", command)
+        return True
+
+
+dispatcher = Dispatcher()
@@ -0,0 +1,142 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from config import EVENTS_FLUSH_SIZE, EVENTS_FLUSH_INTERVAL, EVENTS_RETENTION_DAYS
+from db import get_conn, transaction
+
+logger = logging.getLogger(__name__)
+
+# событие -> метрика дневной сводки (daily_stats)
+ROLLUPS = {
+    "cmd": "cmd",            # key = команда, value = 1
+    "water": "water_ml",     # value = мл
+    "new_user": "new_users",
+}
+PRUNE_INTERVAL = 3600
+
+
+class EventLog:
+    """Поток событий в таблицу logs с инкрементальными дневными сводками.
+
+    record() только добавляет событие в память; фоновый поток пишет пачку одним
+    executemany и в той же транзакции обновляет daily_stats, daily_users (для DAU)
+    и totals. Отчёты читают только сводки, сырые события со временем удаляются.
+    """
+
+    def __init__(self, flush_size=EVENTS_FLUSH_SIZE, flush_interval=EVENTS_FLUSH_INTERVAL,
+                 retention_days=EVENTS_RETENTION_DAYS):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._pruned_at = 0.0
+
+    def record(self, tg_id, event, key="", value=1):
+        self._ensure_started()
+        with self._lock:
+            self._pending.append((tg_id, event, key, value, date.today().isoformat(),
+                                  time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())))
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = []
+            threading.Thread(target=self._run, name="events-flusher", daemon=True).start()
+            atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                    self.prune()
+                    self._pruned_at = time.monotonic()
+            except Exception:
+                logger.exception("Не удалось записать события")
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            stats = Counter()
+            users_by_day = {}
+            new_users = 0
+            for tg_id, event, key, value, day, _ in batch:
+                metric = ROLLUPS.get(event)
+                if metric:
+                    stats[(day, metric, key or "")] += value
+                if event == "new_user":
+                    new_users += value
+                if tg_id is not None:
+                    users_by_day.setdefault(day, set()).add(tg_id)
+            try:
+                with transaction() as cur:
+                    cur.executemany(
+                        "INSERT INTO logs (tg_id, event, key, value, day, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        batch)
+                    for day, users in users_by_day.items():
+                        # rowcount — сколько пользователей сегодня встретились впервые
+                        cur.executemany("INSERT OR IGNORE INTO daily_users (day, tg_id) VALUES (?, ?)",
+                                        [(day, u) for u in users])
+                        if cur.rowcount > 0:
+                            stats[(day, "dau", "")] += cur.rowcount
+                    cur.executemany(
+                        "INSERT INTO daily_stats (day, metric, key, value) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(day, metric, key) DO UPDATE SET value = value + excluded.value",
+                        [(d, m, k, v) for (d, m, k), v in stats.items()])
+                    if new_users:
+                        cur.execute("UPDATE totals SET value = value + ? WHERE metric = 'users'", (new_users,))
+            except Exception:
+                with self._lock:
+                    self._pending = batch + self._pending
+                raise
+            return len(batch)
+
+    def prune(self, today=None):
+        """Удаляет сырые события старше retention_days; сводки остаются."""
+        today = today or date.today()
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        with transaction() as cur:
+            cur.execute("DELETE FROM logs WHERE day < ?", (cutoff,))
+            deleted = cur.rowcount
+            # для подсчёта DAU нужны только текущие сутки (и вчерашние — для запоздавших событий)
+            cur.execute("DELETE FROM daily_users WHERE day < ?", ((today - timedelta(days=1)).isoformat(),))
+        return deleted
+
+
+def read_stats(days, today=None):
+    """Сводка за последние days дней из daily_stats: {(metric, key): [значения по дням]}."""
+    today = today or date.today()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    result = {}
+    for day, metric, key, value in get_conn().execute(
+            "SELECT day, metric, key, value FROM daily_stats WHERE day >= ? ORDER BY day", (since,)):
+        result.setdefault((metric, key), []).append((day, value))
+    return result
+
+
+def total(metric):
+    r = get_conn().execute("SELECT value FROM totals WHERE metric = ?", (metric,)).fetchone()
+    return r[0] if r else 0
+
+
+events = EventLog()
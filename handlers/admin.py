@@ -1,15 +1,64 @@
-from telegram import Update
-from telegram.ext import ContextTypes
+from tg_types import Update, Context
+from datetime import date
 from config import ADMIN_IDS
-from db import get_conn
+from db import scatter, transaction
+from events import read_stats, total
 
-async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+MAX_STATS_DAYS = 365
+
+def parse_period(args):
+    """["30d"] / ["30"] -> 30; без аргумента — 7 дней."""
+    if not args:
+        return 7
+    arg = args[0].lower().rstrip("dд")
+    if not arg.isdigit() or not 1 <= int(arg) <= MAX_STATS_DAYS:
+        return None
+    return int(arg)
+
+async def admin_stats(update: Update, context: Context):
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("Доступ запрещён.")
+        return
+    days = parse_period(context.args)
+    if days is None:
+        await update.message.reply_text(f"Использование: /stats 30d (от 1 до {MAX_STATS_DAYS} дней)")
+        return
+    # читаем только дневные сводки: объём не зависит от числа пользователей и событий
+    stats = read_stats(days)
+    dau = [v for _, v in stats.get(("dau", ""), [])]
+    water = sum(v for _, v in stats.get(("water_ml", ""), []))
+    new_users = sum(v for _, v in stats.get(("new_users", ""), []))
+    commands = sorted(((key, sum(v for _, v in rows)) for (metric, key), rows in stats.items() if metric == "cmd"),
+                      key=lambda kv: -kv[1])
+    lines = [f"📊 Статистика за {days} дн.",
+             f"Пользователей в БД: {total('users')}",
+             f"Новых: {new_users}",
+             f"DAU: среднее {sum(dau) / days:.0f}, максимум {max(dau, default=0)}, сегодня {_today(stats)}",
+             f"Воды отмечено: {water / 1000:.1f} л",
+             f"В челленджах сейчас: {_challengers()}"]
+    if commands:
+        lines.append("\nКоманды:")
+        lines += [f"/{cmd} — {n}" for cmd, n in commands]
+    await update.message.reply_text("\n".join(lines))
+
+def _challengers():
+    # участники по шардам не пересекаются — достаточно сложить счётчики
+    return sum(n for n, in scatter("SELECT COUNT(DISTINCT tg_id) FROM challenges WHERE status = 'active'"))
+
+def _today(stats):
+    rows = stats.get(("dau", ""), [])
+    return rows[-1][1] if rows and rows[-1][0] == date.today().isoformat() else 0
+
+async def broadcast(update: Update, context: Context):
     if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("Доступ запрещён.")
         return
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM users")
-    total = cur.fetchone()[0]
-    conn.close()
-    await update.message.reply_text(f"Пользователей в БД: {total}")
+    text = ' '.join(context.args)
+    if not text:
+        await update.message.reply_text("Использование: /broadcast текст")
+        return
+    # рассылку выполнит планировщик, постранично и с контрольными точками
+    with transaction() as cur:
+        cur.execute("INSERT INTO broadcasts (text, created_by) VALUES (?, ?)", (text, update.effective_user.id))
+        bid = cur.lastrowid
+    await update.message.reply_text(f"Рассылка #{bid} поставлена в очередь.")
@@ -1,15 +1,31 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-from data.analysis_ref import analysis_ref
+from tg_types import Update, Context
+from analysis_index import index, parse_values, sex_key
+from profile_cache import profile_cache
 
-async def analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def analysis(update: Update, context: Context):
     if not context.args:
-        await update.message.reply_text("Использование: /analysis hemoglobin")
+        await update.message.reply_text("Использование: /analysis hemoglobin или /analysis hemoglobin=118 ALT=55")
         return
-    key = context.args[0].lower()
-    info = analysis_ref.get(key) or analysis_ref.get(key.upper())
-    if not info:
-        await update.message.reply_text("Параметр не найден.")
+    p = profile_cache.get(update.effective_user.id)
+    sex = sex_key(p.sex) if p else None
+    text = ' '.join(context.args)
+    if '=' not in text:
+        param = index.find(text)
+        if not param:
+            await update.message.reply_text("Параметр не найден.")
+            return
+        await update.message.reply_text(param.texts[sex])
         return
-    text = f"🩺 {info.get('name', key)}\nНорма: {info.get('norm','-')}\n{info.get('what','')}\n\nСовет: {info.get('advice','Обратитесь к врачу при сомнениях')}"
-    await update.message.reply_text(text)
+    lines = []
+    for name, value in parse_values(text):
+        param = index.find(name)
+        if not param:
+            lines.append(f"{name}: параметр не найден")
+            continue
+        try:
+            lines.append(param.evaluate(float(value.replace(',', '.')), sex))
+        except (AttributeError, ValueError):
+            lines.append(f"{param.name}: не понял значение, пример {name}=118")
+    if sex is None:
+        lines.append("\nПол не указан — нормы общие. Уточните: /setprofile sex=male или sex=female")
+    await update.message.reply_text("🩺 Результаты:\n" + "\n".join(lines))
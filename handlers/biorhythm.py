@@ -1,21 +1,50 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-import math
-from datetime import datetime
+from tg_types import Update, Context
+from datetime import date, timedelta
+from bio_engine import CYCLES, forecast, critical_days
+from handlers.profile import save_profile
+from profile_cache import profile_cache
 
-async def biorhythm(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not context.args:
-        await update.message.reply_text("Укажите дату: /biorhythm YYYY-MM-DD")
+MAX_DAYS = 90
+SHORT = {"physical": "Ф", "emotional": "Э", "intellectual": "И"}
+
+async def biorhythm(update: Update, context: Context):
+    tg = update.effective_user
+    args = list(context.args or [])
+    birth = None
+    if args and "-" in args[0]:
+        try:
+            birth = date.fromisoformat(args.pop(0))
+        except ValueError:
+            await update.message.reply_text("Неверный формат даты. Используй YYYY-MM-DD")
+            return
+        # запоминаем дату, чтобы в следующий раз хватило /biorhythm
+        save_profile(tg, ["birth_date=?"], [birth.isoformat()])
+    else:
+        p = profile_cache.get(tg.id)
+        if p and p.birth_date:
+            birth = date.fromisoformat(p.birth_date)
+    if birth is None:
+        await update.message.reply_text("Укажите дату: /biorhythm YYYY-MM-DD [дней]")
         return
     try:
-        birth = datetime.strptime(context.args[0], "%Y-%m-%d")
-    except:
-        await update.message.reply_text("Неверный формат даты. Используй YYYY-MM-DD")
+        days = min(max(int(args[0]), 1), MAX_DAYS) if args else 1
+    except ValueError:
+        await update.message.reply_text(f"Число дней — от 1 до {MAX_DAYS}, например /biorhythm 1990-05-01 30")
+        return
+    today = date.today()
+    values = forecast(birth, today, days)
+    critical = critical_days(birth, today, days)
+    if days == 1:
+        physical, emotional, intellectual = values[:, 0]
+        await update.message.reply_text(
+            f"📊 Биоритм:\nФизический: {physical}%\nЭмоциональный: {emotional}%\nИнтеллект: {intellectual}%"
+        )
         return
-    days = (datetime.now() - birth).days
-    physical = round(100 * math.sin(2 * math.pi * days / 23), 2)
-    emotional = round(100 * math.sin(2 * math.pi * days / 28), 2)
-    intellectual = round(100 * math.sin(2 * math.pi * days / 33), 2)
-    await update.message.reply_text(
-        f"📊 Биоритм:\nФизический: {physical}%\nЭмоциональный: {emotional}%\nИнтеллект: {intellectual}%"
-    )
+    lines = [f"📊 Биоритм на {days} дн. (Ф — физический, Э — эмоциональный, И — интеллект, ⚠️ — критический день):"]
+    for i in range(days):
+        cells = []
+        for c, (name, _) in enumerate(CYCLES):
+            mark = "⚠️" if critical[c, i] else ""
+            cells.append(f"{SHORT[name]} {values[c, i]:+.0f}{mark}")
+        lines.append(f"{(today + timedelta(days=i)).strftime('%d.%m')}: " + " ".join(cells))
+    await update.message.reply_text("\n".join(lines))
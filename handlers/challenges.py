@@ -1,42 +1,97 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-from db import get_conn
-from datetime import datetime
-
-async def challenges(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = "🏆 Челленджи:\n1) Водный 7-дн (пей 2000 мл/день)\n\nОтметить стакан: /water 250\nПосмотреть: /water status"
-    await update.message.reply_text(text)
-
-async def water(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    conn = get_conn()
-    cur = conn.cursor()
+from tg_types import Update, Context
+import challenge_engine
+from data.challenges import challenges as definitions
+from events import events
+from config import WATER_GOAL_ML
+from water_buffer import water_buffer
+from water_series import PERIODS, series, period_text
+from datetime import date, datetime, timedelta
+
+MAX_WATER_ML = 3000  # за одну отметку
+
+CATALOG_TEXT = "🏆 Челленджи:\n" + "\n".join(
+    f"• {key} — {d['title']}: {d['goal']} мл воды в день, {d['days']} дн. подряд" for key, d in definitions.items()
+) + "\n\nУчаствовать: /challenge join water7\nОтметить стакан: /water 250\nПрогресс: /challenge"
+
+def status_text(tg_id):
+    today = date.today()
+    # строки челленджей читаются по ключу (tg_id, challenge) — без истории воды
+    rows, pending = water_buffer.read(tg_id, today.isoformat(), lambda: challenge_engine.rows(tg_id))
+    if not rows:
+        return "Вы пока не участвуете в челленджах.\n\n" + CATALOG_TEXT
+    lines = ["🏆 Ваши челленджи:"]
+    for row in rows:
+        key, goal, days = row[0], row[5], row[6]
+        streak, progress, value, status = challenge_engine.effective(row, today, pending)
+        title = definitions.get(key, {}).get("title", key)
+        if status == "done":
+            lines.append(f"✅ {title}: выполнен! {days} дн. подряд по {goal} мл")
+        else:
+            lines.append(f"• {title}: серия {streak}/{days} дн., сегодня {value}/{goal} мл, всего дней с нормой: {progress}")
+    return "\n".join(lines)
+
+async def challenges(update: Update, context: Context):
+    await update.message.reply_text(CATALOG_TEXT)
+
+async def challenge(update: Update, context: Context):
+    tg = update.effective_user
+    args = [a.lower() for a in context.args]
+    if not args or args[0] == "status":
+        await update.message.reply_text(status_text(tg.id))
+        return
+    if args[0] not in ("join", "leave") or len(args) < 2 or args[1] not in definitions:
+        await update.message.reply_text(
+            "Использование: /challenge join <ключ>, /challenge leave <ключ>, /challenge — прогресс\n"
+            "Ключи: " + ", ".join(definitions))
+        return
+    key = args[1]
+    if args[0] == "leave":
+        left = challenge_engine.leave(tg.id, key)
+        await update.message.reply_text("Вы вышли из челленджа." if left else "Вы не участвуете в этом челлендже.")
+        return
+    # вода, ещё не сброшенная из буфера, засчитается при сбросе — сам join видит только записанную
+    if not challenge_engine.join(tg.id, key):
+        await update.message.reply_text("Вы уже участвуете. Прогресс: /challenge")
+        return
+    d = definitions[key]
+    await update.message.reply_text(
+        f"🏁 Челлендж «{d['title']}» начат: {d['goal']} мл воды в день, {d['days']} дн. подряд.\n"
+        "Отмечайте воду: /water 250")
+
+async def water(update: Update, context: Context):
+    if context.args and context.args[0].lower() == "status":
+        await water_status(update, context)
+        return
+    if context.args and context.args[0].lower() in PERIODS:
+        await water_history(update, context)
+        return
     tg = update.effective_user
     day = datetime.now().strftime("%Y-%m-%d")
     try:
         amount = int(context.args[0]) if context.args else 250
     except:
         await update.message.reply_text("Неверный формат. Пример: /water 250")
-        conn.close()
-        return
-    cur.execute("SELECT amount_ml FROM water WHERE tg_id=? AND day=?", (tg.id, day))
-    r = cur.fetchone()
-    if r:
-        total = r[0] + amount
-        cur.execute("UPDATE water SET amount_ml=? WHERE tg_id=? AND day=?", (total, tg.id, day))
-    else:
-        total = amount
-        cur.execute("INSERT INTO water (tg_id, day, amount_ml) VALUES (?, ?, ?)", (tg.id, day, amount))
-    conn.commit()
-    conn.close()
+        return
+    if not 0 < amount <= MAX_WATER_ML:
+        await update.message.reply_text(f"Объём — от 1 до {MAX_WATER_ML} мл за раз, например /water 250")
+        return
+    water_buffer.add(tg.id, day, amount)
+    events.record(tg.id, "water", value=amount)
+    total = water_buffer.total(tg.id, day)
     await update.message.reply_text(f"💧 Отмечено {amount} мл. Всего сегодня: {total} мл (цель ~2000 мл).")
 
-async def water_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    conn = get_conn()
-    cur = conn.cursor()
+async def water_status(update: Update, context: Context):
     tg = update.effective_user
     day = datetime.now().strftime("%Y-%m-%d")
-    cur.execute("SELECT amount_ml FROM water WHERE tg_id=? AND day=?", (tg.id, day))
-    r = cur.fetchone()
-    total = r[0] if r else 0
-    conn.close()
+    total = water_buffer.total(tg.id, day)
     await update.message.reply_text(f"💧 Сегодня выпито: {total} мл (цель 2000 мл).")
+
+async def water_history(update: Update, context: Context):
+    tg = update.effective_user
+    period = context.args[0].lower()
+    today = date.today()
+    first = today - timedelta(days=PERIODS[period] - 1)
+    # весь диапазон — одно чтение по ключу (tg_id, day); сегодняшний несброшенный остаток добавляем сверху
+    values, pending = water_buffer.read(tg.id, today.isoformat(), lambda: series(tg.id, first, today))
+    values[-1] += pending
+    await update.message.reply_text(period_text(period, values, first, WATER_GOAL_ML))
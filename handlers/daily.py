@@ -0,0 +1,30 @@
+from tg_types import Update, Context
+from datetime import date, datetime
+from bio_engine import today_batch
+from db import transaction
+from events import events
+from profile_cache import profile_cache
+from scheduler import daily_text, zone
+
+async def daily(update: Update, context: Context):
+    p = profile_cache.get(update.effective_user.id)
+    today = datetime.now(zone(p.tz if p else None)).date()
+    bio = None
+    if p and p.birth_date:
+        bio = today_batch([date.fromisoformat(p.birth_date).toordinal()], today)[:, 0]
+    await update.message.reply_text(daily_text(today, bio))
+
+async def remind(update: Update, context: Context):
+    tg = update.effective_user
+    arg = context.args[0].lower() if context.args else ""
+    if arg not in ("on", "off"):
+        await update.message.reply_text("Напоминания: /remind on или /remind off\nЧасовой пояс: /setprofile tz=Europe/Moscow")
+        return
+    with transaction(tg.id) as cur:
+        cur.execute("INSERT OR IGNORE INTO users (tg_id, first_name, last_name, username, notify) "
+                    "VALUES (?, ?, ?, ?, 0)", (tg.id, tg.first_name or "", tg.last_name or "", tg.username or ""))
+        new = cur.rowcount == 1
+        cur.execute("UPDATE users SET notify=? WHERE tg_id=?", (1 if arg == "on" else 0, tg.id))
+    if new:
+        events.record(tg.id, "new_user")
+    await update.message.reply_text("Напоминания включены." if arg == "on" else "Напоминания выключены.")
@@ -1,13 +1,9 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-from data.exercises import exercises
+from tg_types import Update, Context
+from static_replies import DEFAULT_GOAL, EXERCISE_TEXTS, EXERCISE_NOT_FOUND
 
-async def exercise(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    goal = context.args[0] if context.args else "зарядка"
-    if goal not in exercises:
-        await update.message.reply_text("Цель не найдена. Доступно: " + ', '.join(exercises.keys()))
+async def exercise(update: Update, context: Context):
+    goal = context.args[0] if context.args else DEFAULT_GOAL
+    if goal not in EXERCISE_TEXTS:
+        await update.message.reply_text(EXERCISE_NOT_FOUND)
         return
-    text = f"🏃 Комплекс — {goal}:\n"
-    for i, ex in enumerate(exercises[goal], 1):
-        text += f"{i}. {ex}\n"
-    await update.message.reply_text(text)
+    await update.message.reply_text(EXERCISE_TEXTS[goal])
@@ -1,10 +1,5 @@
-from telegram import Update
-from telegram.ext import ContextTypes
+from tg_types import Update, Context
+from data.texts import meditation as meditation_text
 
-async def meditation(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = (
-        "💨 Дыхание 4-4-4:\n"
-        "Вдох 4 сек — Задержка 4 сек — Выдох 4 сек. Повтори 6–8 циклов.\n"
-        "Также можно 4-6 минут медитации лежа."
-    )
-    await update.message.reply_text(text)
+async def meditation(update: Update, context: Context):
+    await update.message.reply_text(meditation_text)
@@ -1,24 +1,61 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-from data.recipes import recipes
+from tg_types import Update, Context
+from profile_cache import profile_cache
+from recipe_index import catalog, parse_query, daily_targets
+from static_replies import NUTRITION_TEXT
 
-async def nutrition(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # simple list
-    text = "🍽 Рецепты (выберите ключ):\n"
-    for r in recipes:
-        text += f"- {r['key']}: {r['title']}\n"
-    text += "\nЧтобы получить рецепт: /recipe key"
-    await update.message.reply_text(text)
+DEFAULT_KCAL = 2000
 
-async def recipe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def nutrition(update: Update, context: Context):
+    # список собран один раз при импорте
+    await update.message.reply_text(NUTRITION_TEXT)
+
+async def recipe(update: Update, context: Context):
     if not context.args:
         await update.message.reply_text("Укажи ключ рецепта: /recipe ovsyanka")
         return
-    key = context.args[0]
-    for r in recipes:
-        if r['key'] == key:
-            txt = f"🍽 {r['title']}\nИнгредиенты: {', '.join(r['ingredients'])}\n\nПриготовление:\n" + '\n'.join(r['steps'])
-            txt += f"\n\nКалории: ~{r.get('calories','-')} ккал | Б:{r.get('prot','-')}г Ж:{r.get('fat','-')}г У:{r.get('carb','-')}г"
-            await update.message.reply_text(txt)
-            return
-    await update.message.reply_text("Рецепт не найден.")
+    txt = catalog.get(context.args[0])
+    if txt is None:
+        await update.message.reply_text("Рецепт не найден. Поиск: /recipes курица kcal<=500 белок>=30")
+        return
+    await update.message.reply_text(txt)
+
+async def recipes_search(update: Update, context: Context):
+    if not context.args:
+        await update.message.reply_text(
+            "Поиск рецептов: /recipes [ингредиенты] [фильтры]\n"
+            "Фильтры: kcal<=500, белок>=30, жир<15, углеводы<=40\n"
+            "Пример: /recipes курица kcal<=500 белок>=30"
+        )
+        return
+    words, filters = parse_query(' '.join(context.args))
+    found = catalog.search(words, filters)
+    if not found:
+        await update.message.reply_text("Ничего не нашлось. Попробуй ослабить фильтры.")
+        return
+    lines = ["🔎 Найдено:"]
+    for i in found:
+        r = catalog.items[i]
+        lines.append(f"- {r['key']}: {r['title']} — {r.get('calories','-')} ккал, Б {r.get('prot','-')} г")
+    lines.append("\nРецепт: /recipe key")
+    await update.message.reply_text("\n".join(lines))
+
+async def mealplan(update: Update, context: Context):
+    p = profile_cache.get(update.effective_user.id)
+    kcal, prot = daily_targets(p)
+    note = ""
+    if kcal is None:
+        kcal = DEFAULT_KCAL
+        note = "\n\nЦель посчитана по умолчанию. Для точного расчёта: /setprofile sex=male age=30 height=180 weight=80 goal=loss"
+    plan = catalog.plan_day(kcal, prot)
+    if not plan:
+        await update.message.reply_text("В каталоге нет рецептов с калорийностью.")
+        return
+    lines = [f"📋 План на день (цель ~{kcal} ккал" + (f", белок ~{prot} г" if prot else "") + "):"]
+    total = {"calories": 0, "prot": 0, "fat": 0, "carb": 0}
+    for meal, i in plan:
+        r = catalog.items[i]
+        lines.append(f"{meal}: {r['title']} — {r.get('calories','-')} ккал (/recipe {r['key']})")
+        for f in total:
+            total[f] += r.get(f, 0) or 0
+    lines.append(f"\nИтого: {total['calories']} ккал | Б:{total['prot']}г Ж:{total['fat']}г У:{total['carb']}г")
+    await update.message.reply_text("\n".join(lines) + note)
@@ -1,6 +1,9 @@
-from telegram import Update
-from telegram.ext import ContextTypes
-from db import get_conn
+from tg_types import Update, Context
+from datetime import date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from db import transaction
+from events import events
+from profile_cache import profile_cache, SELECT_SQL as PROFILE_SQL
 
 def parse_pairs(text):
     pairs = {}
@@ -10,46 +13,65 @@ def parse_pairs(text):
             pairs[k.strip()] = v.strip()
     return pairs
 
-async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def profile(update: Update, context: Context):
     tg = update.effective_user
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT sex, age, height_cm, weight_kg, goal FROM users WHERE tg_id=?", (tg.id,))
-    r = cur.fetchone()
-    if not r:
+    p = profile_cache.get(tg.id)
+    if not p:
         await update.message.reply_text("Профиль пуст. Установите /setprofile sex=male age=30 height=180 weight=80 goal=loss")
     else:
-        sex,age,height,weight,goal = r
-        await update.message.reply_text(f"👤 Профиль:\nПол: {sex}\nВозраст: {age}\nРост: {height} см\nВес: {weight} кг\nЦель: {goal}")
-    conn.close()
+        text = f"👤 Профиль:\nПол: {p.sex}\nВозраст: {p.age}\nРост: {p.height_cm} см\nВес: {p.weight_kg} кг\nЦель: {p.goal}"
+        if p.birth_date:
+            text += f"\nДата рождения: {p.birth_date}"
+        if p.tz:
+            text += f"\nЧасовой пояс: {p.tz}"
+        await update.message.reply_text(text)
 
-async def setprofile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def save_profile(tg, fields, params):
+    """UPDATE users по списку "колонка=?" с записью результата в кэш профилей."""
+    profile_cache.invalidate(tg.id)
+    with transaction(tg.id) as cur:
+        # ensure user row exists
+        cur.execute("INSERT OR IGNORE INTO users (tg_id, first_name, last_name, username, notify) "
+                    "VALUES (?, ?, ?, ?, 0)", (tg.id, tg.first_name or "", tg.last_name or "", tg.username or ""))
+        new = cur.rowcount == 1
+        cur.execute(f"UPDATE users SET {', '.join(fields)} WHERE tg_id=?", list(params) + [tg.id])
+        row = cur.execute(PROFILE_SQL, (tg.id,)).fetchone()
+    if new:
+        events.record(tg.id, "new_user")
+    return profile_cache.put(tg.id, row)
+
+async def setprofile(update: Update, context: Context):
     tg = update.effective_user
     text = ' '.join(context.args)
     if not text:
-        await update.message.reply_text("Пример: /setprofile sex=male age=30 height=180 weight=80 goal=loss")
+        await update.message.reply_text("Пример: /setprofile sex=male age=30 height=180 weight=80 goal=loss birth=1990-05-01")
         return
     pairs = parse_pairs(text)
-    conn = get_conn()
-    cur = conn.cursor()
-    # ensure user row exists
-    cur.execute("INSERT OR IGNORE INTO users (tg_id, first_name, last_name, username) VALUES (?, ?, ?, ?)",
-                (tg.id, tg.first_name or "", tg.last_name or "", tg.username or ""))
     fields = []
     params = []
-    mapping = {'sex':'sex','age':'age','height':'height_cm','weight':'weight_kg','goal':'goal'}
+    mapping = {'sex':'sex','age':'age','height':'height_cm','weight':'weight_kg','goal':'goal','birth':'birth_date','tz':'tz'}
     for k,v in pairs.items():
         if k in mapping:
             fields.append(f"{mapping[k]}=?")
             if k in ('age','height','weight'):
                 params.append(float(v) if '.' in v else int(v))
+            elif k == 'birth':
+                try:
+                    params.append(date.fromisoformat(v).isoformat())
+                except ValueError:
+                    await update.message.reply_text("Дата рождения в формате YYYY-MM-DD, например birth=1990-05-01")
+                    return
+            elif k == 'tz':
+                try:
+                    ZoneInfo(v)
+                except (ZoneInfoNotFoundError, ValueError):
+                    await update.message.reply_text("Не знаю такой часовой пояс. Пример: tz=Europe/Moscow")
+                    return
+                params.append(v)
             else:
                 params.append(v)
     if fields:
-        params.append(tg.id)
-        cur.execute(f"UPDATE users SET {', '.join(fields)} WHERE tg_id=?", params)
-        conn.commit()
+        save_profile(tg, fields, params)
         await update.message.reply_text("Профиль обновлён.")
     else:
         await update.message.reply_text("Не распознал поля. Пример: sex=male age=30 height=180 weight=80 goal=loss")
-    conn.close()
@@ -0,0 +1,10 @@
+from tg_types import Update, Context
+from data.sections import main_menu, sections
+from static_replies import parse_command
+
+async def menu(update: Update, context: Context):
+    await update.message.reply_text(main_menu, parse_mode="Markdown")
+
+async def section(update: Update, context: Context):
+    command = parse_command(update.message.text)[0].lower()
+    await update.message.reply_text(sections.get(command, "Раздел не найден 🤔"), parse_mode="Markdown")
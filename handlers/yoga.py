@@ -1,6 +1,5 @@
-from telegram import Update
-from telegram.ext import ContextTypes
+from tg_types import Update, Context
+from data.texts import yoga as yoga_text
 
-async def yoga(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = "🧘 Утренняя растяжка:\n1) Наклоны головы 30 сек\n2) Кошка-корова 1 мин\n3) Наклон вперед 1 мин\n4) Савасана 1 мин"
-    await update.message.reply_text(text)
+async def yoga(update: Update, context: Context):
+    await update.message.reply_text(yoga_text)
@@ -1,117 +1,134 @@
+import logging
 import os
-import telebot
-from flask import Flask, request
+import sqlite3
+import threading
+import time
+from flask import Flask, Response, request, jsonify
+from config import (
+    WEBHOOK_MODE, UPDATE_WORKERS, UPDATE_QUEUE_SIZE, UPDATE_QUEUE_OVERFLOW, UPDATE_DRAIN_TIMEOUT,
+    INLINE_REPLIES, SCHEDULER_ENABLED, PRELOAD_HANDLERS,
+)
+import db
+import metrics
+import static_replies
+from data.sections import main_menu, sections
+from dispatcher import dispatcher, HANDLERS
+from events import events
+from tg_types import Update
+from update_dedup import dedup
+from update_queue import UpdateQueue, update_key
+
+logger = logging.getLogger(__name__)
 
-# Загружаем токен из переменных окружения (обязательно укажи TELEGRAM_TOKEN в Render)
-TOKEN = os.environ.get("TELEGRAM_TOKEN")
-bot = telebot.TeleBot(TOKEN)
+# таблицы создаются (и догоняют новые колонки) при каждом старте
+db.init_db()
 
 # Flask-приложение
 app = Flask(__name__)
 
-# --- Главное меню ---
-main_menu = (
-    "🌿 Добро пожаловать в *LifeRhythm Bot*!\n\n"
-    "Этот бот поможет тебе на пути к гармоничной жизни: здоровье, развитие, "
-    "баланс и осознанность.\n\n"
-    "📌 Выбери интересующий раздел:\n\n"
-    "1️⃣ /health — Здоровье\n"
-    "2️⃣ /mind — Развитие ума\n"
-    "3️⃣ /soul — Душа и эмоции\n"
-    "4️⃣ /productivity — Продуктивность\n"
-    "5️⃣ /lifestyle — Образ жизни\n"
-    "6️⃣ /practices — Практики и упражнения\n"
-    "7️⃣ /resources — Полезные ресурсы\n"
-)
+# --- Статические ответы прямо в ответе webhook (без отдельного запроса к Telegram) ---
+static_table = static_replies.render(main_menu, sections)
+
+# --- Очередь апдейтов ---
+# команды маршрутизирует dispatcher.HANDLERS, модули обработчиков грузятся при первом вызове
+def process_update(update):
+    dispatcher.dispatch(update)
+
+updates = UpdateQueue(process_update, workers=UPDATE_WORKERS, maxsize=UPDATE_QUEUE_SIZE,
+                      overflow=UPDATE_QUEUE_OVERFLOW)
+updates.register_shutdown(UPDATE_DRAIN_TIMEOUT)
+
+# tg_client (requests) и планировщик (numpy) не нужны для первого ответа — грузим их не при старте
+def outbound():
+    from tg_client import client
+    return client
+
+def start_background():
+    if SCHEDULER_ENABLED:
+        # напоминания и рассылки работают в одном из воркеров
+        from scheduler import scheduler
+        scheduler.start()
+    if PRELOAD_HANDLERS:
+        dispatcher.preload()
+    # журналы воды упавших воркеров — в БД до первых /water status, /challenge и напоминаний
+    from water_buffer import water_buffer
+    water_buffer.start()
 
-# --- Ответы по разделам ---
-sections = {
-    "health": (
-        "🏥 *Здоровье*\n\n"
-        "Здоровье — фундамент гармоничной жизни. Несколько направлений:\n\n"
-        "• Питание: соблюдай баланс белков, жиров и углеводов.\n"
-        "• Вода: 1.5–2 л чистой воды в день.\n"
-        "• Сон: 7–9 часов качественного сна.\n"
-        "• Движение: хотя бы 30 минут активности ежедневно.\n\n"
-        "👉 Практика: введи привычку *утренней зарядки* на 5–10 минут."
-    ),
-    "mind": (
-        "🧠 *Развитие ума*\n\n"
-        "Развитие ума помогает поддерживать ясность и уверенность.\n\n"
-        "• Чтение книг каждый день.\n"
-        "• Обучение новым навыкам.\n"
-        "• Ведение дневника идей.\n"
-        "• Решение логических задач.\n\n"
-        "👉 Практика: заведи правило *30 минут чтения* каждый вечер."
-    ),
-    "soul": (
-        "💖 *Душа и эмоции*\n\n"
-        "Внутреннее состояние определяет качество жизни.\n\n"
-        "• Практикуй благодарность.\n"
-        "• Обращай внимание на дыхание.\n"
-        "• Находи время для тишины.\n"
-        "• Разговаривай с близкими.\n\n"
-        "👉 Практика: каждый вечер записывай *3 вещи*, за которые благодарен."
-    ),
-    "productivity": (
-        "📅 *Продуктивность*\n\n"
-        "Правильная организация времени — ключ к успеху.\n\n"
-        "• Используй технику Pomodoro (25 мин работа / 5 мин отдых).\n"
-        "• Планируй день вечером.\n"
-        "• Убирай отвлекающие факторы.\n"
-        "• Разделяй важное и срочное.\n\n"
-        "👉 Практика: начни день с *трёх главных задач*."
-    ),
-    "lifestyle": (
-        "🌍 *Образ жизни*\n\n"
-        "Здоровый образ жизни формируется из привычек.\n\n"
-        "• Старайся больше двигаться.\n"
-        "• Минимизируй стресс.\n"
-        "• Проводите время на свежем воздухе.\n"
-        "• Поддерживай социальные связи.\n\n"
-        "👉 Практика: добавь *ежедневную прогулку* 20–30 минут."
-    ),
-    "practices": (
-        "🧘 *Практики и упражнения*\n\n"
-        "Простые практики для баланса:\n\n"
-        "• Медитация 5–10 минут.\n"
-        "• Утренняя разминка.\n"
-        "• Дыхательные упражнения.\n"
-        "• Практика осознанности (наблюдай за собой).\n\n"
-        "👉 Выбери то, что ближе, и начни с малого."
-    ),
-    "resources": (
-        "📚 *Полезные ресурсы*\n\n"
-        "Книги:\n"
-        "• 'Сила настоящего' — Экхарт Толле\n"
-        "• '7 навыков высокоэффективных людей' — Стивен Кови\n"
-        "• 'Атомные привычки' — Джеймс Клир\n\n"
-        "Приложения:\n"
-        "• Headspace — медитации\n"
-        "• Notion — организация задач\n"
-        "• Habitica — развитие привычек\n\n"
-        "👉 Используй их для укрепления гармонии."
-    ),
-}
-
-# --- Обработчики команд ---
-@bot.message_handler(commands=["start", "help"])
-def send_welcome(message):
-    bot.send_message(message.chat.id, main_menu, parse_mode="Markdown")
-
-@bot.message_handler(commands=list(sections.keys()))
-def section_handler(message):
-    command = message.text.lstrip("/")
-    response = sections.get(command, "Раздел не найден 🤔")
-    bot.send_message(message.chat.id, response, parse_mode="Markdown")
+# --- Метрики ---
+metrics.gauge("update_queue_depth", updates.depth)
+metrics.gauge("outbound_pending", lambda: outbound().pending())
+metrics.start()
+
+threading.Thread(target=start_background, name="startup", daemon=True).start()
 
 # --- Webhook обработчик ---
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    json_str = request.get_data().decode("UTF-8")
-    update = telebot.types.Update.de_json(json_str)
-    bot.process_new_updates([update])
-    return "ok", 200
+    started = time.perf_counter()
+    mode, response = _webhook()
+    metrics.inc("updates_total", (("mode", mode),))
+    metrics.observe("webhook_latency_seconds", (("mode", mode),), time.perf_counter() - started)
+    return response
+
+def _webhook():
+    try:
+        # UnicodeDecodeError — тоже ValueError: битое тело — 400, а не 500
+        update = Update.de_json(request.get_data().decode("UTF-8"))
+    except (ValueError, KeyError, TypeError):
+        return "invalid", ("bad update", 400)
+    key = update_key(update)
+    try:
+        fresh = dedup.claim(key, update.update_id)
+    except sqlite3.OperationalError:
+        # шард занят дольше busy_timeout: на 500 Telegram будет повторять доставку и задержит
+        # следующие апдейты — обрабатываем без проверки на повтор
+        logger.exception("Не удалось проверить update_id %s на повтор", update.update_id)
+        fresh = True
+    if not fresh:
+        return "duplicate", ("ok", 200)
+    # статический ответ в теле webhook обогнал бы ещё не обработанные команды этого чата
+    if INLINE_REPLIES and update.message is not None and not updates.busy(key):
+        payload = static_replies.lookup(static_table, update.message.chat.id, update.message.text)
+        if payload is not None:
+            _record_command(update)
+            return "inline", Response(payload, status=200, mimetype="application/json")
+    if WEBHOOK_MODE != "queue":
+        _record_command(update)
+        process_update(update)
+        return "sync", ("ok", 200)
+    if not updates.submit(key, update):
+        if UPDATE_QUEUE_OVERFLOW != "drop":
+            # Telegram повторит доставку позже
+            try:
+                dedup.release(key, update.update_id)
+            except sqlite3.OperationalError:
+                logger.exception("Не удалось снять отметку update_id %s", update.update_id)
+            return "rejected", ("busy", 503)
+        return "dropped", ("ok", 200)
+    _record_command(update)
+    return "queued", ("ok", 200)
+
+def _record_command(update):
+    # только для принятых апдейтов: отклонённый (503) придёт повторно и посчитался бы дважды
+    message = update.message
+    if message is not None and message.from_user is not None:
+        parsed = static_replies.parse_command(message.text)
+        if parsed:
+            # журнал событий пишется пачками в фоне, здесь только запись в память
+            command = parsed[0].lower()
+            events.record(message.from_user.id, "cmd", command if command in HANDLERS else "other")
+
+@app.route("/queue", methods=["GET"])
+def queue_stats():
+    return jsonify(updates.stats()), 200
+
+@app.route("/outbound", methods=["GET"])
+def outbound_stats():
+    return jsonify(outbound().stats()), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/", methods=["GET"])
 def index():
@@ -0,0 +1,339 @@
+import asyncio
+import contextvars
+import fcntl
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from config import METRICS_DIR, METRICS_FLUSH_INTERVAL
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STALE_AFTER = 3600  # снимок не обновлялся столько секунд — воркер считается умершим
+RETIRED = "retired.json"
+
+HELP = {
+    "command_latency_seconds": ("histogram", "Время обработки команды: total, из него db и api"),
+    "command_errors_total": ("counter", "Исключения в обработчиках команд"),
+    "commands_total": ("counter", "Обработанные команды"),
+    "webhook_latency_seconds": ("histogram", "Время ответа /webhook"),
+    "updates_total": ("counter", "Апдейты, принятые /webhook, по способу обработки"),
+    "db_lock_wait_seconds": ("histogram", "Ожидание блокировки записи SQLite (BEGIN IMMEDIATE)"),
+    "update_queue_depth": ("gauge", "Глубина очереди апдейтов"),
+    "outbound_pending": ("gauge", "Сообщения в очереди фоновой отправки"),
+    "profile_cache_lookups_total": ("counter", "Чтения кэша профилей: попадания и промахи"),
+    "profile_cache_evictions_total": ("counter", "Вытеснения из кэша профилей: по размеру (lru) и по ttl"),
+    "profile_cache_size": ("gauge", "Профилей в кэше воркера"),
+}
+
+
+class _Shard:
+    """Счётчики одного потока: пишет в них только владелец, поэтому без блокировок."""
+
+    __slots__ = ("counters", "hists")
+
+    def __init__(self):
+        self.counters = {}
+        self.hists = {}
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_gauges = {}
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name, labels=(), value=1):
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, seconds):
+    hists = _shard().hists
+    key = (name, labels)
+    h = hists.get(key)
+    if h is None:
+        # корзины + count + sum
+        h = hists[key] = [0] * (len(BUCKETS) + 3)
+    h[bisect_left(BUCKETS, seconds)] += 1
+    h[-2] += 1
+    h[-1] += seconds
+
+
+def gauge(name, fn):
+    """Значение снимается в момент выгрузки: fn() -> число."""
+    _gauges[name] = fn
+
+
+# --- Разбивка времени команды на БД и Bot API ---
+_current = contextvars.ContextVar("metrics_command", default=None)
+
+
+def add_db(seconds):
+    acc = _current.get()
+    if acc is not None:
+        acc[0] += seconds
+
+
+def add_api(seconds):
+    acc = _current.get()
+    if acc is not None:
+        acc[1] += seconds
+
+
+def _finish(command, started, acc, failed):
+    total = time.perf_counter() - started
+    labels = (("command", command),)
+    observe("command_latency_seconds", labels + (("part", "total"),), total)
+    observe("command_latency_seconds", labels + (("part", "db"),), acc[0])
+    observe("command_latency_seconds", labels + (("part", "api"),), acc[1])
+    inc("commands_total", labels)
+    if failed:
+        inc("command_errors_total", labels)
+
+
+def instrument(command):
+    """Декоратор обработчика команды (обычного или async).
+
+    command — имя команды или функция от аргументов обработчика, возвращающая имя.
+    """
+    def name_of(args, kwargs):
+        return command(*args, **kwargs) if callable(command) else command
+
+    def wrap(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                name = name_of(args, kwargs)
+                acc = [0.0, 0.0]
+                token = _current.set(acc)
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = await fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    _current.reset(token)
+                    _finish(name, started, acc, failed)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            name = name_of(args, kwargs)
+            acc = [0.0, 0.0]
+            token = _current.set(acc)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _current.reset(token)
+                _finish(name, started, acc, failed)
+        return wrapper
+    return wrap
+
+
+# --- Выгрузка и сбор по воркерам gunicorn ---
+def snapshot():
+    counters, hists = {}, {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, v in list(shard.counters.items()):
+            counters[key] = counters.get(key, 0) + v
+        for key, h in list(shard.hists.items()):
+            acc = hists.get(key)
+            hists[key] = list(h) if acc is None else [a + b for a, b in zip(acc, h)]
+    gauges = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            gauges[(name, ())] = float(fn())
+        except Exception:
+            pass
+    return {
+        "counters": [[k[0], list(k[1]), v] for k, v in counters.items()],
+        "hists": [[k[0], list(k[1]), h] for k, h in hists.items()],
+        "gauges": [[k[0], list(k[1]), v] for k, v in gauges.items()],
+    }
+
+
+def _path(pid=None):
+    return os.path.join(METRICS_DIR, f"metrics-{pid or os.getpid()}.json")
+
+
+def dump():
+    """Пишет снимок этого воркера в METRICS_DIR (атомарно через rename)."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    tmp = _path() + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, _path())
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add(counters, hists, data):
+    for name, labels, v in data["counters"]:
+        key = (name, tuple(tuple(x) for x in labels))
+        counters[key] = counters.get(key, 0) + v
+    for name, labels, h in data["hists"]:
+        key = (name, tuple(tuple(x) for x in labels))
+        acc = hists.get(key)
+        hists[key] = h if acc is None else [a + b for a, b in zip(acc, h)]
+
+
+def _retire(dead, retired):
+    """Счётчики и гистограммы умерших воркеров переносятся в retired.json, снимки удаляются.
+
+    Так суммы на /metrics только растут: Prometheus не видит сброса, когда воркер
+    перезапускается. В "folded" — снимки последнего переноса: если процесс упал между
+    записью retired.json и удалением снимка, повторно он не прибавится."""
+    counters, hists = {}, {}
+    _add(counters, hists, retired)
+    folded = []
+    for path in dead:
+        name = os.path.basename(path)
+        try:
+            if name not in retired.get("folded", ()):
+                with open(path) as f:
+                    _add(counters, hists, json.load(f))
+                folded.append(name)
+        except (OSError, ValueError):
+            continue
+    data = {
+        "counters": [[k[0], list(k[1]), v] for k, v in counters.items()],
+        "hists": [[k[0], list(k[1]), h] for k, h in hists.items()],
+        "folded": folded,
+    }
+    tmp = os.path.join(METRICS_DIR, RETIRED + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, os.path.join(METRICS_DIR, RETIRED))
+    for path in dead:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return data
+
+
+def collect():
+    """Суммирует снимки живых воркеров и накопленные счётчики умерших (retired.json).
+
+    Воркер считается умершим, если его процесса нет или снимок не обновлялся STALE_AFTER
+    секунд. Его gauges сразу перестают учитываться, счётчики переносятся в retired.json.
+    Весь сбор идёт под flock: иначе соседний воркер мог бы перенести снимок между
+    чтением retired.json и чтением снимков, и сумма на миг уменьшилась бы."""
+    dump()
+    counters, hists, gauges = {}, {}, {}
+    now = time.time()
+    with open(os.path.join(METRICS_DIR, "metrics.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(os.path.join(METRICS_DIR, RETIRED)) as f:
+                retired = json.load(f)
+        except (OSError, ValueError):
+            retired = {"counters": [], "hists": []}
+        dead = []
+        for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+                if pid != os.getpid() and (not _alive(pid) or now - os.path.getmtime(path) > STALE_AFTER):
+                    dead.append(path)
+                    continue
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            _add(counters, hists, data)
+            for name, labels, v in data["gauges"]:
+                key = (name, tuple(tuple(x) for x in labels))
+                gauges[key] = gauges.get(key, 0) + v
+        if dead:
+            retired = _retire(dead, retired)
+    _add(counters, hists, retired)
+    return counters, hists, gauges
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Текст в формате Prometheus по всем воркерам."""
+    counters, hists, gauges = collect()
+    lines = []
+    seen = set()
+
+    def header(name):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), v in sorted(counters.items()):
+        header(name)
+        lines.append(f"{name}{_labels(labels)} {v}")
+    for (name, labels), v in sorted(gauges.items()):
+        header(name)
+        lines.append(f"{name}{_labels(labels)} {v}")
+    for (name, labels), h in sorted(hists.items()):
+        header(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, h):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {h[-2]}")
+        lines.append(f"{name}_count{_labels(labels)} {h[-2]}")
+        lines.append(f"{name}_sum{_labels(labels)} {h[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+_pid = None
+
+
+def start():
+    """Фоновая выгрузка снимка, чтобы /metrics любого воркера видел остальные."""
+    global _pid
+    if _pid == os.getpid():
+        return
+    _pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            try:
+                dump()
+            except OSError:
+                pass
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+import metrics
+from config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+from db import get_conn
+
+FIELDS = ("sex", "age", "height_cm", "weight_kg", "goal", "birth_date", "tz")
+SELECT_SQL = f"SELECT {', '.join(FIELDS)} FROM users WHERE tg_id=?"
+HIT, MISS = (("result", "hit"),), (("result", "miss"),)
+LRU, EXPIRED = (("reason", "lru"),), (("reason", "ttl"),)
+
+
+class Profile:
+    __slots__ = ("tg_id", "found", "expires") + FIELDS
+
+    def __init__(self, tg_id, row=None, expires=0.0):
+        self.tg_id = tg_id
+        self.found = row is not None
+        self.expires = expires
+        for name, value in zip(FIELDS, row or (None,) * len(FIELDS)):
+            setattr(self, name, value)
+
+
+class ProfileCache:
+    """LRU + TTL кэш профилей из таблицы users.
+
+    Отсутствующий профиль тоже кэшируется, чтобы не ходить в БД на каждое сообщение
+    от пользователя без профиля. Другие воркеры gunicorn увидят изменения не позже чем через ttl.
+    """
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tg_id):
+        """Профиль пользователя или None, если профиля нет."""
+        now = time.monotonic()
+        with self._lock:
+            p = self._data.get(tg_id)
+            if p is not None:
+                if p.expires > now:
+                    self._data.move_to_end(tg_id)
+                    metrics.inc("profile_cache_lookups_total", HIT)
+                    return p if p.found else None
+                del self._data[tg_id]
+                metrics.inc("profile_cache_evictions_total", EXPIRED)
+        metrics.inc("profile_cache_lookups_total", MISS)
+        row = get_conn(tg_id).execute(SELECT_SQL, (tg_id,)).fetchone()
+        p = self._store(tg_id, row)
+        return p if p.found else None
+
+    def put(self, tg_id, row):
+        """Запись поверх кэша: row — строка users в порядке FIELDS (None — профиля нет)."""
+        return self._store(tg_id, row)
+
+    def invalidate(self, tg_id):
+        with self._lock:
+            self._data.pop(tg_id, None)
+
+    def _store(self, tg_id, row):
+        p = Profile(tg_id, row, time.monotonic() + self.ttl)
+        evicted = 0
+        with self._lock:
+            self._data[tg_id] = p
+            self._data.move_to_end(tg_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            metrics.inc("profile_cache_evictions_total", LRU, evicted)
+        return p
+
+    def size(self):
+        return len(self._data)
+
+
+profile_cache = ProfileCache()
+metrics.gauge("profile_cache_size", profile_cache.size)
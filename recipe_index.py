@@ -0,0 +1,154 @@
+import re
+import numpy as np
+from analysis_index import sex_key
+from data.recipes import recipes
+
+MACROS = ("calories", "prot", "fat", "carb")
+FIELD_ALIASES = {
+    "kcal": "calories", "ккал": "calories", "калории": "calories", "calories": "calories",
+    "prot": "prot", "белок": "prot", "белки": "prot", "б": "prot",
+    "fat": "fat", "жир": "fat", "жиры": "fat", "ж": "fat",
+    "carb": "carb", "углеводы": "carb", "у": "carb",
+}
+FILTER_RE = re.compile(r"^([a-zа-яё]+)(<=|>=|<|>|=)(\d+(?:[.,]\d+)?)$", re.I)
+WORD_RE = re.compile(r"[a-zа-яё]+", re.I)
+# короткие слова ("с", "и", "на") не индексируются — и в запросе их не ищем
+MIN_WORD = 3
+# доли дневной калорийности по приёмам пищи
+MEALS = (("Завтрак", 0.3), ("Обед", 0.4), ("Ужин", 0.3))
+
+
+def stem(word):
+    # грубая основа: "курица", "куриного", "курицей" -> "кури"
+    w = word.lower().replace("ё", "е")
+    return w[:4]
+
+
+def recipe_text(r):
+    txt = f"🍽 {r['title']}\nИнгредиенты: {', '.join(r['ingredients'])}\n\nПриготовление:\n" + '\n'.join(r['steps'])
+    txt += f"\n\nКалории: ~{r.get('calories','-')} ккал | Б:{r.get('prot','-')}г Ж:{r.get('fat','-')}г У:{r.get('carb','-')}г"
+    return txt
+
+
+def parse_query(text):
+    """"курица с рисом kcal<=500 белок>=30" -> (["курица", "рисом"], [("calories", "<=", 500.0), ("prot", ">=", 30.0)])."""
+    words, filters = [], []
+    for part in text.split():
+        m = FILTER_RE.match(part)
+        if m and m.group(1).lower() in FIELD_ALIASES:
+            filters.append((FIELD_ALIASES[m.group(1).lower()], m.group(2), float(m.group(3).replace(",", "."))))
+        else:
+            words.extend(w for w in WORD_RE.findall(part) if len(w) >= MIN_WORD)
+    return words, filters
+
+
+class RecipeCatalog:
+    """Каталог рецептов: ключ -> индекс, обратный индекс по словам ингредиентов и названия,
+    БЖУ в массивах numpy для векторных фильтров по диапазонам."""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.by_key = {r["key"]: i for i, r in enumerate(self.items)}
+        self.texts = [recipe_text(r) for r in self.items]
+        self.words = {}
+        for i, r in enumerate(self.items):
+            for w in WORD_RE.findall(" ".join(r["ingredients"]) + " " + r["title"]):
+                if len(w) >= MIN_WORD:
+                    self.words.setdefault(stem(w), set()).add(i)
+        self.macros = {
+            f: np.array([r.get(f, np.nan) for r in self.items], dtype=np.float64) for f in MACROS
+        }
+
+    def get(self, key):
+        i = self.by_key.get(key)
+        return None if i is None else self.texts[i]
+
+    def mask(self, filters):
+        mask = np.ones(len(self.items), dtype=bool)
+        for field, op, value in filters:
+            col = self.macros[field]
+            if op == "<":
+                mask &= col < value
+            elif op == "<=":
+                mask &= col <= value
+            elif op == ">":
+                mask &= col > value
+            elif op == ">=":
+                mask &= col >= value
+            else:
+                mask &= col == value
+        return mask
+
+    def search(self, words=(), filters=(), limit=20):
+        """Индексы рецептов, где есть все слова и выполнены все фильтры; по убыванию белка."""
+        mask = self.mask(filters)
+        if words:
+            ids = None
+            for w in words:
+                found = self.words.get(stem(w), set())
+                ids = found if ids is None else ids & found
+                if not ids:
+                    return []
+            word_mask = np.zeros(len(self.items), dtype=bool)
+            word_mask[list(ids)] = True
+            mask &= word_mask
+        idx = np.flatnonzero(mask)
+        if len(idx) > limit:
+            prot = np.nan_to_num(self.macros["prot"][idx], nan=-1)
+            idx = idx[np.argpartition(-prot, limit)[:limit]]
+        prot = np.nan_to_num(self.macros["prot"][idx], nan=-1)
+        return idx[np.argsort(-prot, kind="stable")].tolist()
+
+    def plan_day(self, kcal_target, prot_target=None):
+        """Подбирает по рецепту на приём пищи под калорийность (и белок, если задан).
+
+        Для каждого приёма — argmin отклонения по всему каталогу одним векторным выражением;
+        недобор/перебор переносится на следующие приёмы.
+        """
+        kcal = self.macros["calories"]
+        prot = np.nan_to_num(self.macros["prot"])
+        valid = ~np.isnan(kcal)
+        if not valid.any():
+            return []
+        used = np.zeros(len(self.items), dtype=bool)
+        plan = []
+        left_kcal, left_share = kcal_target, 1.0
+        left_prot = prot_target
+        for name, share in MEALS:
+            slot_kcal = max(50.0, left_kcal * share / left_share)
+            score = np.abs(kcal - slot_kcal) / slot_kcal
+            if left_prot:
+                slot_prot = left_prot * share / left_share
+                score = score + 0.5 * np.maximum(0.0, slot_prot - prot) / slot_prot
+            # повторяем рецепт, только если каталог меньше числа приёмов
+            candidates = valid & ~used if (valid & ~used).any() else valid
+            score = np.where(candidates, score, np.inf)
+            i = int(np.argmin(score))
+            used[i] = True
+            plan.append((name, i))
+            left_kcal -= kcal[i]
+            left_share -= share
+            if left_prot:
+                left_prot = max(0.0, left_prot - prot[i])
+        return plan
+
+
+def daily_targets(p):
+    """Калорийность по Миффлину — Сан Жеору (коэф. активности 1.375) и белок по весу.
+
+    p — запись профиля; без пола/возраста/роста/веса — (None, None).
+    """
+    sex = sex_key(p.sex) if p else None
+    if not p or sex is None or not (p.age and p.height_cm and p.weight_kg):
+        return None, None
+    bmr = 10 * float(p.weight_kg) + 6.25 * float(p.height_cm) - 5 * float(p.age) + (5 if sex == "m" else -161)
+    kcal = bmr * 1.375
+    goal = (p.goal or "").lower()
+    if goal in ("loss", "похудение", "снижение"):
+        kcal *= 0.85
+    elif goal in ("gain", "набор", "масса"):
+        kcal *= 1.1
+    return round(kcal), round(1.5 * float(p.weight_kg))
+
+
+catalog = RecipeCatalog(recipes)
@@ -0,0 +1,235 @@
+import fcntl
+import heapq
+import logging
+import os
+import threading
+import time
+from itertools import islice
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+import bio_engine
+import challenge_engine
+from config import (
+    SCHEDULER_LOCK_PATH, SCHEDULER_PAGE, DEFAULT_TZ, DAILY_HOUR, WATER_REMINDER_HOUR, WATER_GOAL_ML,
+)
+from data.motivation import motivation
+from db import get_conn, scatter, shards, transaction
+from tg_client import client
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 30
+# ежедневное задание, которое не начиналось дольше этого после своего часа, пропускаем
+LATE_START = 3 * 3600
+
+
+def zone(name):
+    try:
+        return ZoneInfo(name or DEFAULT_TZ)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TZ)
+
+
+def daily_text(day, bio=None):
+    """Мотивация дня; bio — (физ, эмоц, интеллект) на сегодня, если известна дата рождения."""
+    text = f"☀️ Мотивация дня:\n{motivation[day.toordinal() % len(motivation)]}"
+    if bio is not None:
+        text += f"\n\n📊 Биоритм: Ф {bio[0]:+.0f}% · Э {bio[1]:+.0f}% · И {bio[2]:+.0f}%"
+    return text
+
+
+def water_text(total):
+    return f"💧 Сегодня выпито {total} мл из {WATER_GOAL_ML}. Отметить стакан: /water 250"
+
+
+def iter_pages(sql, params, after=0, page=SCHEDULER_PAGE):
+    """Постраничный обход по tg_id (keyset): в памяти одновременно только одна страница.
+
+    sql должен отбирать "tg_id > ?" первым параметром и заканчиваться ORDER BY tg_id LIMIT ?.
+    Пользователи разнесены по шардам: страница каждого шарда уже отсортирована по tg_id,
+    слияние даёт общий порядок, и контрольная точка last_tg_id остаётся одной на задание.
+    """
+    while True:
+        rows = list(islice(heapq.merge(*(
+            get_conn(shard=shard).execute(sql, (after, *params, page)).fetchall() for shard in shards()
+        )), page))
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+# --- Задания ---
+# Ежедневные задания запускаются по местному времени пользователя. Пользователи
+# сгруппированы по часовому поясу: в куче лежит не по записи на пользователя,
+# а по записи на (задание, пояс), а самих пользователей читаем страницами при запуске.
+
+def _daily_pages(job, after):
+    sql = ("SELECT tg_id, birth_date FROM users WHERE tg_id > ? AND tz IS ? AND notify = 1 "
+           "ORDER BY tg_id LIMIT ?")
+    for rows in iter_pages(sql, (job["tz"],), after):
+        day = job["day"]
+        births = [r[1] for r in rows]
+        with_birth = [i for i, b in enumerate(births) if b]
+        values = {}
+        if with_birth:
+            ordinals = np.array([date.fromisoformat(births[i]).toordinal() for i in with_birth])
+            batch = bio_engine.today_batch(ordinals, day)
+            values = {i: batch[:, k] for k, i in enumerate(with_birth)}
+        yield rows[-1][0], [(r[0], daily_text(day, values.get(i))) for i, r in enumerate(rows)]
+
+
+def _water_pages(job, after):
+    # вода лежит в том же шарде, что и пользователь, — JOIN остаётся внутри шарда
+    sql = ("SELECT u.tg_id, COALESCE(w.amount_ml, 0) FROM users u "
+           "LEFT JOIN water_days w ON w.tg_id = u.tg_id AND w.day = ?2 "
+           "WHERE u.tg_id > ?1 AND u.tz IS ?3 AND u.notify = 1 ORDER BY u.tg_id LIMIT ?4")
+    for rows in iter_pages(sql, (job["day"].toordinal(), job["tz"]), after):
+        yield rows[-1][0], [(tg_id, water_text(total)) for tg_id, total in rows if total < WATER_GOAL_ML]
+
+
+def _broadcast_pages(job, after):
+    sql = "SELECT tg_id FROM users WHERE tg_id > ? ORDER BY tg_id LIMIT ?"
+    for rows in iter_pages(sql, (), after):
+        yield rows[-1][0], [(r[0], job["text"]) for r in rows]
+
+
+def _no_pages(job, after):
+    return ()
+
+
+def _rollover(job):
+    return challenge_engine.rollover(job["day"])
+
+
+DAILY_JOBS = (("daily", DAILY_HOUR, _daily_pages), ("water", WATER_REMINDER_HOUR, _water_pages))
+
+
+def run_job(job, sender=client):
+    """Прогоняет задание с последней контрольной точки. Контрольная точка пишется
+    после того, как страница ушла в Telegram, поэтому после рестарта повторяется
+    не больше одной страницы."""
+    key = job["key"]
+    with transaction() as cur:
+        cur.execute("INSERT OR IGNORE INTO job_checkpoints (job) VALUES (?)", (key,))
+        after, sent, done = cur.execute(
+            "SELECT last_tg_id, sent, done FROM job_checkpoints WHERE job=?", (key,)).fetchone()
+    if done:
+        return sent
+    if "run" in job:
+        # служебное задание без рассылки: выполняется целиком, контрольная точка — только done
+        sent = job["run"](job)
+    for last_tg_id, messages in job.get("pages", _no_pages)(job, after):
+        for tg_id, text in messages:
+            sender.submit(tg_id, text)
+        while not sender.drain(timeout=60.0):
+            logger.info("Задание %s ждёт отправки страницы", key)
+        sent += len(messages)
+        with transaction() as cur:
+            cur.execute("UPDATE job_checkpoints SET last_tg_id=?, sent=?, updated_at=CURRENT_TIMESTAMP "
+                        "WHERE job=?", (last_tg_id, sent, key))
+    with transaction() as cur:
+        cur.execute("UPDATE job_checkpoints SET done=1, updated_at=CURRENT_TIMESTAMP WHERE job=?", (key,))
+        if job.get("broadcast_id"):
+            cur.execute("UPDATE broadcasts SET done=1 WHERE id=?", (job["broadcast_id"],))
+    logger.info("Задание %s завершено: %s сообщений", key, sent)
+    return sent
+
+
+class Scheduler:
+    """Куча заданий по времени запуска (UTC). Работает в одном процессе на все воркеры:
+    кто взял файловую блокировку, тот и рассылает."""
+
+    def __init__(self, lock_path=SCHEDULER_LOCK_PATH):
+        self.lock_path = lock_path
+        self._heap = []
+        self._planned = set()
+        self._lock_fd = None
+        self._pid = None
+        self._seq = 0
+        self._planned_hour = None
+
+    def _try_lock(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def push(self, due, job):
+        if job["key"] in self._planned:
+            return
+        self._planned.add(job["key"])
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, job))
+
+    def plan_day(self, now=None):
+        """Ставит ежедневные задания на сегодня по каждому часовому поясу, где есть пользователи."""
+        now = now or datetime.now(timezone.utc)
+        zones = sorted({r[0] for r in scatter("SELECT DISTINCT tz FROM users WHERE notify = 1")}, key=str)
+        for tz_name in zones:
+            tz = zone(tz_name)
+            local_day = now.astimezone(tz).date()
+            for kind, hour, pages in DAILY_JOBS:
+                due = datetime(local_day.year, local_day.month, local_day.day, hour, tzinfo=tz)
+                job = {"key": f"{kind}:{local_day.isoformat()}:{tz_name or ''}", "tz": tz_name,
+                       "day": local_day, "pages": pages}
+                if job["key"] in self._planned:
+                    continue
+                if now.timestamp() - due.timestamp() > LATE_START and not self._started(job["key"]):
+                    # процесс поднялся спустя часы после времени рассылки — утреннее сообщение вечером не шлём
+                    self._planned.add(job["key"])
+                    continue
+                self.push(due.timestamp(), job)
+        # дни воды пишутся по часам сервера — и закрываются в полночь сервера
+        today = datetime.now().date()
+        self.push(datetime(today.year, today.month, today.day).timestamp(),
+                  {"key": f"rollover:{today.isoformat()}", "day": today, "run": _rollover})
+
+    def _started(self, key):
+        return get_conn().execute("SELECT 1 FROM job_checkpoints WHERE job=?", (key,)).fetchone() is not None
+
+    def plan_broadcasts(self):
+        for bid, text in get_conn().execute("SELECT id, text FROM broadcasts WHERE done = 0 ORDER BY id"):
+            self.push(0, {"key": f"broadcast:{bid}", "broadcast_id": bid, "text": text,
+                          "pages": _broadcast_pages})
+
+    def run_due(self, now=None):
+        now = now or time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, job = heapq.heappop(self._heap)
+            try:
+                run_job(job)
+            except Exception:
+                logger.exception("Задание %s упало, продолжим с контрольной точки", job["key"])
+                self._planned.discard(job["key"])
+
+    def _run(self):
+        while not self._try_lock():
+            time.sleep(POLL_INTERVAL)
+        logger.info("Планировщик запущен в процессе %s", os.getpid())
+        while True:
+            try:
+                hour = int(time.time() // 3600)
+                if hour != self._planned_hour:
+                    # новые сутки в каком-нибудь поясе наступают на границе часа
+                    self.plan_day()
+                    self._planned_hour = hour
+                self.plan_broadcasts()
+                self.run_due()
+            except Exception:
+                logger.exception("Ошибка планировщика")
+            time.sleep(POLL_INTERVAL)
+
+    def start(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="scheduler", daemon=True).start()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,80 @@
+import json
+from data.exercises import exercises
+from data.recipes import recipes
+from data import texts
+
+DEFAULT_GOAL = "зарядка"
+NUTRITION_LIST_LIMIT = 30
+
+
+# --- Тексты, которые не зависят от пользователя: собираются один раз при импорте ---
+def exercise_text(goal):
+    text = f"🏃 Комплекс — {goal}:\n"
+    for i, ex in enumerate(exercises[goal], 1):
+        text += f"{i}. {ex}\n"
+    return text
+
+
+def nutrition_text():
+    text = "🍽 Рецепты (выберите ключ):\n"
+    for r in recipes[:NUTRITION_LIST_LIMIT]:
+        text += f"- {r['key']}: {r['title']}\n"
+    if len(recipes) > NUTRITION_LIST_LIMIT:
+        text += f"…и ещё {len(recipes) - NUTRITION_LIST_LIMIT}. Поиск: /recipes курица kcal<=500\n"
+    text += "\nЧтобы получить рецепт: /recipe key\nПлан питания на день: /mealplan"
+    return text
+
+
+EXERCISE_TEXTS = {goal: exercise_text(goal) for goal in exercises}
+EXERCISE_NOT_FOUND = "Цель не найдена. Доступно: " + ', '.join(exercises.keys())
+NUTRITION_TEXT = nutrition_text()
+
+
+# --- Готовые тела ответа webhook ---
+# Telegram принимает в ответе на webhook один вызов метода. Всё, кроме chat_id,
+# сериализуем заранее, на запрос остаётся склеить байты.
+_PREFIX = b'{"method":"sendMessage","chat_id":'
+
+
+def _payload(text, parse_mode=None):
+    body = {"text": text}
+    if parse_mode:
+        body["parse_mode"] = parse_mode
+    return b"," + json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()[1:]
+
+
+def render(main_menu, sections):
+    """Таблица (команда, аргумент или None) -> хвост JSON-тела sendMessage."""
+    table = {
+        ("start", None): _payload(main_menu, "Markdown"),
+        ("help", None): _payload(texts.help_text),
+        ("yoga", None): _payload(texts.yoga),
+        ("meditation", None): _payload(texts.meditation),
+        ("nutrition", None): _payload(NUTRITION_TEXT),
+        ("exercise", None): _payload(EXERCISE_TEXTS[DEFAULT_GOAL]),
+    }
+    for name, text in sections.items():
+        table[(name, None)] = _payload(text, "Markdown")
+    for goal, text in EXERCISE_TEXTS.items():
+        table[("exercise", goal)] = _payload(text)
+    return table
+
+
+def parse_command(text):
+    """"/cmd@bot arg" -> ("cmd", "arg"); не команда — None."""
+    if not text or text[0] != "/":
+        return None
+    parts = text.split()
+    command = parts[0][1:].split("@", 1)[0]
+    return command, " ".join(parts[1:]) or None
+
+
+def lookup(table, chat_id, text):
+    """Готовое тело ответа для статической команды или None."""
+    key = parse_command(text)
+    if key is None:
+        return None
+    tail = table.get(key)
+    if tail is None:
+        return None
+    return _PREFIX + str(chat_id).encode() + tail
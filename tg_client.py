@@ -0,0 +1,288 @@
+import atexit
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+import requests
+import metrics
+from requests.adapters import HTTPAdapter
+from config import (
+    BOT_TOKEN, TELEGRAM_API_URL, TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_POOL_SIZE,
+    TG_MAX_RETRIES, TG_TIMEOUT, TG_SENDERS, TG_MAX_PENDING, TG_PROCESSES,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT = 4096
+
+
+class TelegramError(Exception):
+    def __init__(self, method, status, description):
+        super().__init__(f"{method}: {status} {description}")
+        self.status = status
+        self.description = description
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: take() сразу списывает токен и говорит, сколько ждать."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, now, seconds):
+        """Ничего не выдавать seconds секунд (flood-wait); паузы от параллельных 429 не складываются."""
+        self.take(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def idle(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class TelegramClient:
+    """Исходящие вызовы Bot API.
+
+    Общий пул keep-alive соединений, глобальный (~30 сообщений/с) и per-chat (~1/с)
+    лимиты, повтор 429 по retry_after и 5xx с экспоненциальной задержкой и джиттером.
+    Глобальный лимит — на процесс: TG_GLOBAL_RATE делится на TG_PROCESSES, а 429
+    останавливает все отправки процесса на retry_after, а не только упавший вызов.
+    call() отправляет синхронно; submit() ставит сообщение в очередь отправщиков,
+    которые выбирают чаты по готовности и склеивают подряд идущие сообщения одного чата.
+    """
+
+    def __init__(self, token=BOT_TOKEN, base_url=TELEGRAM_API_URL, global_rate=TG_GLOBAL_RATE / TG_PROCESSES,
+                 chat_rate=TG_CHAT_RATE, chat_burst=TG_CHAT_BURST, pool_size=TG_POOL_SIZE,
+                 max_retries=TG_MAX_RETRIES, timeout=TG_TIMEOUT, senders=TG_SENDERS,
+                 max_pending=TG_MAX_PENDING):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/"
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.senders = senders
+        self.max_pending = max_pending
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # глобальный лимит без всплесков: Telegram считает ~30 сообщений в любую секунду
+        self._global = TokenBucket(global_rate, 1)
+        self._chats = {}
+        self._limit_lock = threading.Lock()
+        # очередь отправщиков: сообщения по чатам + куча (время готовности, chat_id)
+        self._queues = {}
+        self._ready = []
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._pid = None
+        # статистика
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=2048)
+        self._sent_times = deque(maxlen=10000)
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.merged = 0
+
+    # --- лимиты ---
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 50000:
+                # выкидываем вёдра чатов, которые уже полностью восстановились
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _acquire(self, chat_id):
+        with self._limit_lock:
+            now = time.monotonic()
+            wait = self._global.take(now)
+            if chat_id is not None:
+                wait = max(wait, self._chat_bucket(chat_id, now).take(now))
+        if wait > 0:
+            time.sleep(wait)
+
+    def _chat_wait(self, chat_id):
+        """Сколько ждать до следующего сообщения в чат, не списывая токен."""
+        with self._limit_lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                return 0.0
+            now = time.monotonic()
+            tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            return 0.0 if tokens >= 1 else (1 - tokens) / bucket.rate
+
+    # --- синхронный вызов ---
+    def call(self, method, **params):
+        # в метрики команды идёт всё время вызова: ожидание лимитов, запрос и повторы
+        started = time.perf_counter()
+        try:
+            return self._call(method, params)
+        finally:
+            metrics.add_api(time.perf_counter() - started)
+
+    def _call(self, method, params):
+        chat_id = params.get("chat_id")
+        attempt = 0
+        while True:
+            self._acquire(chat_id)
+            started = time.monotonic()
+            try:
+                resp = self.session.post(self.url + method, json=params, timeout=self.timeout)
+                status = resp.status_code
+                data = resp.json() if resp.content else {}
+            except (requests.RequestException, ValueError) as e:
+                status, data = None, {"description": str(e)}
+            elapsed = time.monotonic() - started
+            if status == 200 and data.get("ok", True):
+                self._record(elapsed)
+                return data.get("result")
+            retry_after = None
+            if status == 429:
+                with self._stats_lock:
+                    self.throttled += 1
+                retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+                # flood-wait на весь бот: остальные отправщики тоже ждут, а не ловят свои 429
+                with self._limit_lock:
+                    self._global.pause(time.monotonic(), retry_after)
+            elif status is not None and status < 500:
+                self._fail()
+                raise TelegramError(method, status, data.get("description"))
+            if attempt >= self.max_retries:
+                self._fail()
+                raise TelegramError(method, status, data.get("description"))
+            attempt += 1
+            with self._stats_lock:
+                self.retries += 1
+            if retry_after is not None:
+                # саму паузу выдержит _acquire() на глобальном ведре
+                delay = random.uniform(0, 0.5)
+            else:
+                delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+            time.sleep(delay)
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.call("sendMessage", chat_id=chat_id, text=text, **kwargs)
+
+    # --- асинхронная отправка ---
+    def submit(self, chat_id, text, **kwargs):
+        """Ставит сообщение в очередь. Блокирует, если в очереди уже max_pending сообщений."""
+        self._ensure_started()
+        with self._cond:
+            while self._pending >= self.max_pending:
+                self._cond.wait()
+            q = self._queues.get(chat_id)
+            if q is None:
+                q = self._queues[chat_id] = deque()
+                heapq.heappush(self._ready, (time.monotonic() + self._chat_wait(chat_id), chat_id))
+            q.append((text, kwargs))
+            self._pending += 1
+            self._cond.notify_all()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            for i in range(self.senders):
+                threading.Thread(target=self._sender, name=f"tg-sender-{i}", daemon=True).start()
+            atexit.register(self.drain)
+            self._pid = os.getpid()
+
+    def _take_batch(self, q):
+        """Склеивает подряд идущие сообщения одного чата с одинаковыми параметрами в одно."""
+        text, kwargs = q.popleft()
+        count = 1
+        while q and q[0][1] == kwargs and len(text) + 2 + len(q[0][0]) <= MAX_TEXT:
+            text += "\n\n" + q.popleft()[0]
+            count += 1
+        return text, kwargs, count
+
+    def _sender(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                ready_at, chat_id = self._ready[0]
+                delay = ready_at - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._ready)
+                text, kwargs, count = self._take_batch(self._queues[chat_id])
+            try:
+                self.send_message(chat_id, text, **kwargs)
+            except Exception:
+                logger.exception("Не удалось отправить сообщение в чат %s", chat_id)
+            with self._cond:
+                self._pending -= count
+                self.merged += count - 1
+                if self._queues[chat_id]:
+                    heapq.heappush(self._ready, (time.monotonic() + self._chat_wait(chat_id), chat_id))
+                else:
+                    del self._queues[chat_id]
+                self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def drain(self, timeout=30.0):
+        """Ждёт, пока очередь submit() опустеет."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self._pending == 0
+
+    # --- статистика ---
+    def _record(self, elapsed):
+        with self._stats_lock:
+            self.sent += 1
+            self._latencies.append(elapsed)
+            self._sent_times.append(time.monotonic())
+
+    def _fail(self):
+        with self._stats_lock:
+            self.failed += 1
+
+    def stats(self, window=60.0):
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            now = time.monotonic()
+            recent = sum(1 for t in self._sent_times if now - t <= window)
+            sent = self.sent
+
+        def pct(p):
+            return round(1000 * latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1) if latencies else 0.0
+
+        return {
+            "sent": sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled_429": self.throttled,
+            "merged": self.merged,
+            "pending": self.pending(),
+            "throughput_per_s": round(recent / window, 2),
+            "latency_p50_ms": pct(0.50),
+            "latency_p99_ms": pct(0.99),
+        }
+
+
+client = TelegramClient()
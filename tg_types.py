@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+
+class User:
+    __slots__ = ("id", "first_name", "last_name", "username")
+
+    def __init__(self, id, first_name=None, last_name=None, username=None):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+
+    @classmethod
+    def de_dict(cls, d):
+        if not d:
+            return None
+        return cls(d["id"], d.get("first_name"), d.get("last_name"), d.get("username"))
+
+
+class Chat:
+    __slots__ = ("id", "type")
+
+    def __init__(self, id, type=None):
+        self.id = id
+        self.type = type
+
+    @classmethod
+    def de_dict(cls, d):
+        return cls(d["id"], d.get("type"))
+
+
+class Message:
+    __slots__ = ("message_id", "chat", "from_user", "text", "date")
+
+    def __init__(self, message_id, chat, from_user=None, text=None, date=None):
+        self.message_id = message_id
+        self.chat = chat
+        self.from_user = from_user
+        self.text = text
+        self.date = date
+
+    @classmethod
+    def de_dict(cls, d):
+        if not d:
+            return None
+        return cls(d.get("message_id"), Chat.de_dict(d["chat"]), User.de_dict(d.get("from")),
+                   d.get("text"), d.get("date"))
+
+    async def reply_text(self, text, **kwargs):
+        # tg_client (requests) грузится при первой отправке, а не при старте;
+        # сам HTTP-вызов блокирующий — уводим его в пул потоков, чтобы не стопорить общий цикл
+        from tg_client import client
+        return await asyncio.to_thread(client.send_message, self.chat.id, text, **kwargs)
+
+
+class CallbackQuery:
+    __slots__ = ("id", "from_user", "data", "message")
+
+    def __init__(self, id, from_user, data=None, message=None):
+        self.id = id
+        self.from_user = from_user
+        self.data = data
+        self.message = message
+
+    @classmethod
+    def de_dict(cls, d):
+        if not d:
+            return None
+        return cls(d["id"], User.de_dict(d.get("from")), d.get("data"), Message.de_dict(d.get("message")))
+
+
+class Update:
+    """Апдейт Bot API в объёме, нужном обработчикам: тот же интерфейс, что у python-telegram-bot
+    (update.message.reply_text, update.effective_user), без самой библиотеки."""
+
+    __slots__ = ("update_id", "message", "edited_message", "callback_query")
+
+    def __init__(self, update_id, message=None, edited_message=None, callback_query=None):
+        self.update_id = update_id
+        self.message = message
+        self.edited_message = edited_message
+        self.callback_query = callback_query
+
+    @classmethod
+    def de_json(cls, raw):
+        d = json.loads(raw)
+        return cls(d["update_id"], Message.de_dict(d.get("message")),
+                   Message.de_dict(d.get("edited_message")), CallbackQuery.de_dict(d.get("callback_query")))
+
+    @property
+    def effective_message(self):
+        return self.message or self.edited_message or (self.callback_query and self.callback_query.message)
+
+    @property
+    def effective_user(self):
+        if self.callback_query is not None:
+            return self.callback_query.from_user
+        msg = self.message or self.edited_message
+        return msg.from_user if msg is not None else None
+
+    @property
+    def effective_chat(self):
+        msg = self.effective_message
+        return msg.chat if msg is not None else None
+
+
+class Context:
+    """Аргументы команды: "/water 250" -> args == ["250"]."""
+
+    __slots__ = ("args",)
+
+    def __init__(self, args=()):
+        self.args = list(args)
@@ -0,0 +1,112 @@
+"""Перенос данных пользователей на другое число шардов (DB_SHARDS).
+
+Запускать при остановленном боте. Читает users, water_days и challenges из текущих
+файлов (--from-shards, по умолчанию DB_SHARDS) и раскладывает строки по shard_of(tg_id)
+в файлы нового числа шардов; общие таблицы (журнал, сводки, рассылки) остаются в DB_PATH.
+Затем исходные таблицы пользователей очищаются — без --keep-source данные не лежат в двух местах.
+После переноса запустите бот с DB_SHARDS=<новое число>.
+
+    python -m tools.reshard --shards 4 [--from-shards 1] [--db liferhythm.db] [--keep-source]
+
+Файл с несколькими шардами называется по числу шардов (liferhythm-s0of4.db), поэтому
+старые и новые файлы не пересекаются. processed_updates не переносится: это окно
+последних update_id, повторы старше остановки бота Telegram уже не пришлёт. water_applied
+тоже: журналы воды упавших воркеров нужно дослать до переноса — запустить и остановить бот.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DB_PATH, DB_SHARDS
+from db import SHARDED_TABLES, _count, init_shard, shard_of, shard_path
+
+COPIED_TABLES = tuple(t for t in SHARDED_TABLES if t not in ("processed_updates", "water_applied"))
+BATCH = 5000
+
+
+def reshard(base, old, new, keep_source=False, log=print):
+    sources = [shard_path(i, old, base) for i in range(old)]
+    targets = [shard_path(i, new, base) for i in range(new)]
+    for path in sources:
+        if not os.path.exists(path):
+            raise SystemExit(f"Нет файла шарда {path}: проверьте --from-shards и --db")
+        # старые БД догоняют схему (колонки, water -> water_days) до копирования
+        init_shard(path)
+    for path in targets:
+        init_shard(path)
+        if _count(path):
+            raise SystemExit(f"В {path} уже есть пользователи — перенос остановлен")
+
+    started = time.perf_counter()
+    copied = dict.fromkeys(COPIED_TABLES, 0)
+    conns = [sqlite3.connect(path, isolation_level=None) for path in targets]
+    try:
+        for conn in conns:
+            conn.execute("BEGIN IMMEDIATE")
+        for path in sources:
+            with closing(sqlite3.connect(path)) as src:
+                for table in COPIED_TABLES:
+                    columns = [r[1] for r in src.execute(f"PRAGMA table_info({table})")]
+                    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))})")
+                    tg = columns.index("tg_id")
+                    rows = src.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                    while True:
+                        batch = rows.fetchmany(BATCH)
+                        if not batch:
+                            break
+                        groups = {}
+                        for row in batch:
+                            groups.setdefault(shard_of(row[tg], new), []).append(row)
+                        for shard, group in groups.items():
+                            conns[shard].executemany(sql, group)
+                        copied[table] += len(batch)
+        for conn in conns:
+            conn.execute("COMMIT")
+    except BaseException:
+        for conn in conns:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        raise
+    finally:
+        for conn in conns:
+            conn.close()
+    log(f"Скопировано за {time.perf_counter() - started:.1f} с: "
+        + ", ".join(f"{table} {n}" for table, n in copied.items()))
+
+    if keep_source:
+        log("Исходные таблицы оставлены (--keep-source)")
+        return copied
+    for path in sources:
+        with closing(sqlite3.connect(path, isolation_level=None)) as src:
+            src.execute("BEGIN IMMEDIATE")
+            for table in SHARDED_TABLES:
+                src.execute(f"DELETE FROM {table}")
+            src.execute("COMMIT")
+            src.execute("VACUUM")
+    log("Исходные таблицы пользователей очищены: " + ", ".join(sources))
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, required=True, help="новое число шардов")
+    parser.add_argument("--from-shards", type=int, default=DB_SHARDS, help="текущее число шардов")
+    parser.add_argument("--db", default=DB_PATH, help="DB_PATH")
+    parser.add_argument("--keep-source", action="store_true", help="не очищать исходные таблицы")
+    args = parser.parse_args()
+    if args.shards < 1 or args.from_shards < 1:
+        parser.error("число шардов должно быть не меньше 1")
+    if args.shards == args.from_shards:
+        parser.error("--shards совпадает с --from-shards, переносить нечего")
+    reshard(args.db, args.from_shards, args.shards, args.keep_source)
+    print(f"Готово. Запускайте бот с DB_SHARDS={args.shards}")
+
+
+if __name__ == "__main__":
+    main()
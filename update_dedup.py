@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from config import UPDATE_DEDUP_WINDOW, UPDATE_DEDUP_CACHE
+from db import transaction
+
+PRUNE_EVERY = 1000
+
+
+class UpdateDedup:
+    """Отбрасывает повторные доставки апдейта по update_id.
+
+    Telegram повторяет webhook при таймауте или ответе не 200, и повтор может прийти в
+    другой воркер gunicorn. Поэтому общий индекс — таблица processed_updates в шарде чата
+    (там же, где данные пользователя), перед ней — LRU этого процесса для быстрых повторов.
+    update_id растут монотонно, так что индекс держит только окно последних window номеров.
+    """
+
+    def __init__(self, window=UPDATE_DEDUP_WINDOW, cache_size=UPDATE_DEDUP_CACHE):
+        self.window = window
+        self.cache_size = cache_size
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserted = 0
+        self.duplicates = 0
+
+    def claim(self, key, update_id):
+        """True — апдейт пришёл впервые и его нужно обработать; False — повтор."""
+        with self._lock:
+            if update_id in self._seen:
+                self._seen.move_to_end(update_id)
+                self.duplicates += 1
+                return False
+        with transaction(key) as cur:
+            cur.execute("INSERT OR IGNORE INTO processed_updates (update_id) VALUES (?)", (update_id,))
+            fresh = cur.rowcount == 1
+            if fresh:
+                with self._lock:
+                    self._inserted += 1
+                    prune = self._inserted % PRUNE_EVERY == 0
+                if prune:
+                    cur.execute("DELETE FROM processed_updates WHERE update_id < ?", (update_id - self.window,))
+        with self._lock:
+            self._seen[update_id] = True
+            if len(self._seen) > self.cache_size:
+                self._seen.popitem(last=False)
+            if not fresh:
+                self.duplicates += 1
+        return fresh
+
+    def release(self, key, update_id):
+        """Забыть апдейт, который не был принят (503) — повтор Telegram должен пройти."""
+        with self._lock:
+            self._seen.pop(update_id, None)
+        with transaction(key) as cur:
+            cur.execute("DELETE FROM processed_updates WHERE update_id = ?", (update_id,))
+
+
+dedup = UpdateDedup()
@@ -0,0 +1,156 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def update_key(update):
+    """Ключ упорядочивания: апдейты одного чата обрабатываются строго по очереди."""
+    for attr in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        msg = getattr(update, attr, None)
+        if msg is not None:
+            return msg.chat.id
+    cb = getattr(update, "callback_query", None)
+    if cb is not None and cb.from_user is not None:
+        return cb.from_user.id
+    return update.update_id
+
+
+class UpdateQueue:
+    """Ограниченная очередь апдейтов с пулом воркеров.
+
+    Каждый воркер владеет своей подочередью, апдейт попадает в подочередь
+    по ключу чата — так сообщения одного чата не обгоняют друг друга.
+    """
+
+    def __init__(self, handler, workers=4, maxsize=1000, overflow="reject"):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.overflow = overflow
+        per_worker = max(1, maxsize // self.workers)
+        self._queues = [queue.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._inflight = {}  # ключ чата -> принятые и ещё не обработанные апдейты
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.wait_total = 0.0
+
+    def _ensure_started(self):
+        # gunicorn может форкнуть процесс после импорта — потоки поднимаем в том процессе, где работаем
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = []
+            for i, q in enumerate(self._queues):
+                t = threading.Thread(target=self._worker, args=(q,), name=f"update-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._pid = os.getpid()
+
+    def submit(self, key, item):
+        """Кладёт апдейт в очередь. False — очередь переполнена."""
+        self._ensure_started()
+        q = self._queues[hash(key) % self.workers]
+        with self._lock:
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+        try:
+            q.put_nowait((time.monotonic(), key, item))
+        except queue.Full:
+            with self._lock:
+                self._done(key)
+                if self.overflow == "drop":
+                    self.dropped += 1
+                else:
+                    self.rejected += 1
+            return False
+        with self._lock:
+            self.accepted += 1
+            depth = self.depth()
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def busy(self, key):
+        """У чата есть принятые, но ещё не обработанные апдейты."""
+        return key in self._inflight
+
+    def _done(self, key):
+        n = self._inflight[key] - 1
+        if n:
+            self._inflight[key] = n
+        else:
+            del self._inflight[key]
+
+    def _worker(self, q):
+        while True:
+            entry = q.get()
+            if entry is _STOP:
+                q.task_done()
+                return
+            enqueued_at, key, item = entry
+            waited = time.monotonic() - enqueued_at
+            ok = True
+            try:
+                self.handler(item)
+            except Exception:
+                ok = False
+                logger.exception("Ошибка обработки апдейта")
+            finally:
+                q.task_done()
+            with self._lock:
+                self._done(key)
+                self.processed += 1
+                self.wait_total += waited
+                if not ok:
+                    self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            processed = self.processed
+            return {
+                "workers": self.workers,
+                "capacity": sum(q.maxsize for q in self._queues),
+                "depth": self.depth(),
+                "depth_per_worker": [q.qsize() for q in self._queues],
+                "max_depth": self.max_depth,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "dropped": self.dropped,
+                "processed": processed,
+                "errors": self.errors,
+                "avg_wait_ms": round(1000 * self.wait_total / processed, 2) if processed else 0.0,
+            }
+
+    def stop(self, timeout=10.0):
+        """Дожидается обработки уже принятых апдейтов и останавливает воркеры."""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        for q in self._queues:
+            try:
+                q.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                logger.warning("Очередь апдейтов не успела опустеть при остановке")
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        self._pid = None
+
+    def register_shutdown(self, timeout=10.0):
+        atexit.register(self.stop, timeout)
@@ -0,0 +1,282 @@
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import threading
+import uuid
+import challenge_engine
+from config import WATER_FLUSH_SIZE, WATER_FLUSH_INTERVAL, WATER_JOURNAL_DIR
+from db import shard_of, shards, transaction
+from water_series import day_total, ordinal
+
+logger = logging.getLogger(__name__)
+
+UPSERT_SQL = (
+    "INSERT INTO water_days (tg_id, day, amount_ml) VALUES (?, ?, ?) "
+    "ON CONFLICT(tg_id, day) DO UPDATE SET amount_ml = amount_ml + excluded.amount_ml"
+)
+APPLIED_SQL = (
+    "INSERT INTO water_applied (writer, seq) VALUES (?, ?) "
+    "ON CONFLICT(writer) DO UPDATE SET seq = excluded.seq, updated_at = CURRENT_TIMESTAMP"
+)
+# номер текущего (не отделённого) журнала: он всегда последний у своего процесса
+LAST_SEQ = 2**62
+APPLIED_RETENTION_DAYS = 30
+
+
+def _by_shard(batch):
+    groups = {}
+    for key, v in batch.items():
+        groups.setdefault(shard_of(key[0]), {})[key] = v
+    return groups
+
+
+def _write(shard, group, writer=None, seq=0):
+    """Пачка одного шарда {(tg_id, "YYYY-MM-DD"): мл} в water_days и в прогресс челленджей — в одной транзакции.
+
+    writer/seq — процесс и сегмент журнала, из которого пачка. Сегменты процесса пишутся
+    по возрастанию seq, поэтому если шард уже видел этот seq, пачка в нём уже есть."""
+    rows = [(k[0], k[1], v) for k, v in group.items()]
+    with transaction(shard=shard) as cur:
+        if writer is not None:
+            r = cur.execute("SELECT seq FROM water_applied WHERE writer = ?", (writer,)).fetchone()
+            if r and r[0] >= seq:
+                return False
+            cur.execute(APPLIED_SQL, (writer, seq))
+        cur.executemany(UPSERT_SQL, [(tg_id, ordinal(day), v) for tg_id, day, v in rows])
+        challenge_engine.apply(cur, "water", rows)
+    return True
+
+
+def _parse_journal(name):
+    """"water-<pid>.<writer>.journal[.flushing-<seq>]" -> (pid, writer, seq).
+    В журналах прежнего формата ("water-<pid>.journal") writer нет — None."""
+    head, _, rest = name.partition(".journal")
+    pid, _, writer = head[len("water-"):].partition(".")
+    seq = int(rest[len(".flushing-"):]) if rest.startswith(".flushing-") and rest[len(".flushing-"):].isdigit() \
+        else LAST_SEQ
+    return int(pid), writer or None, seq
+
+
+def _read_journal(path):
+    batch = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 3:
+                continue  # недописанная строка при падении
+            key = (int(parts[0]), parts[1])
+            batch[key] = batch.get(key, 0) + int(parts[2])
+    return batch
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WaterBuffer:
+    """Буфер отложенной записи для /water.
+
+    Прибавки копятся в памяти по ключу (tg_id, day) и сбрасываются пачкой
+    одним executemany на шард — по размеру или по таймеру.
+    Каждая прибавка дописывается в журнал процесса, чтобы пережить рестарт воркера.
+    При сбросе журнал отделяется в сегмент с номером seq; вместе с пачкой в транзакции
+    шарда записывается (writer, seq), так что повтор сегмента после падения не задвоит воду.
+    """
+
+    def __init__(self, flush_size=WATER_FLUSH_SIZE, flush_interval=WATER_FLUSH_INTERVAL,
+                 journal_dir=WATER_JOURNAL_DIR):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.journal_dir = journal_dir
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._journal_fd = None
+        self._writer = None
+        self._seq = 0
+        # отделённые сегменты, записанные не во все шарды: [(путь или None, seq, {шард: пачка})]
+        self._segments = []
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    # --- журнал ---
+    def _journal_path(self):
+        return os.path.join(self.journal_dir, f"water-{os.getpid()}.{self._writer}.journal")
+
+    def _open_journal(self):
+        if not self.journal_dir:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._journal_fd = os.open(self._journal_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _rotate_journal(self):
+        """Отделяет журнал забранной пачки в сегмент; сегмент удаляется, когда пачка во всех шардах."""
+        self._seq += 1
+        if self._journal_fd is None:
+            return None
+        os.close(self._journal_fd)
+        path = f"{self._journal_path()}.flushing-{self._seq}"
+        os.rename(self._journal_path(), path)
+        self._open_journal()
+        return path
+
+    def recover(self):
+        """Досылает в БД журналы процессов, которые умерли не успев сбросить буфер."""
+        if not self.journal_dir or not os.path.isdir(self.journal_dir):
+            return 0
+        me = os.getpid()
+        recovered = 0
+        # воркеры стартуют одновременно: журналы досылает один, остальные ждут
+        with open(os.path.join(self.journal_dir, "recover.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = []
+            # replay-* — журналы, забранные на повтор прежней версией
+            for path in glob.glob(os.path.join(self.journal_dir, "water-*.journal*")) + \
+                    glob.glob(os.path.join(self.journal_dir, "replay-*-water-*.journal*")):
+                name = os.path.basename(path)
+                try:
+                    if name.startswith("replay-"):
+                        owner, name = name[len("replay-"):].split("-", 1)
+                        pid, writer, seq = _parse_journal(name)
+                        pid = int(owner)
+                    else:
+                        pid, writer, seq = _parse_journal(name)
+                except ValueError:
+                    continue
+                if name.endswith(".tmp"):
+                    continue
+                # pid мог достаться нам после рестарта контейнера — такой журнал тоже чужой
+                if pid != me and _pid_alive(pid):
+                    continue
+                segments.append((writer or "", seq, path, writer))
+            # сегменты одного процесса — строго по возрастанию seq, как их писал он сам
+            for _, seq, path, writer in sorted(segments):
+                batch = _read_journal(path)
+                for shard, group in _by_shard(batch).items():
+                    _write(shard, group, writer, seq)
+                os.remove(path)
+                recovered += len(batch)
+            # отметки нужны, только пока жив сегмент журнала; досланные выше больше не нужны
+            for shard in shards():
+                with transaction(shard=shard) as cur:
+                    cur.execute("DELETE FROM water_applied WHERE updated_at < datetime('now', ?)",
+                                (f"-{APPLIED_RETENTION_DAYS} days",))
+        if recovered:
+            logger.info("Восстановлено %s записей воды из журнала", recovered)
+        return recovered
+
+    # --- жизненный цикл ---
+    def start(self):
+        """Досылает журналы упавших воркеров и запускает фоновый сброс (один раз на процесс)."""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # после fork буфер и журнал родителя не наши
+            self._pending = {}
+            self._segments = []
+            self._journal_fd = None
+            self._writer = uuid.uuid4().hex[:12]
+            self._seq = 0
+            try:
+                self.recover()
+            except Exception:
+                logger.exception("Не удалось восстановить журнал воды")
+            self._open_journal()
+            threading.Thread(target=self._run, name="water-flusher", daemon=True).start()
+            atexit.register(self.close)
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось сбросить буфер воды")
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Буфер воды не сброшен при остановке, данные остались в журнале")
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+            if not self._pending and not self._segments:
+                os.remove(self._journal_path())
+
+    # --- API ---
+    def add(self, tg_id, day, amount):
+        self._ensure_started()
+        with self._lock:
+            key = (tg_id, day)
+            self._pending[key] = self._pending.get(key, 0) + amount
+            if self._journal_fd is not None:
+                os.write(self._journal_fd, f"{tg_id} {day} {amount}\n".encode())
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wakeup.set()
+
+    def read(self, tg_id, day, query):
+        """(query(), несброшенная прибавка за день) — согласованно относительно сброса."""
+        # первое чтение после рестарта уже должно видеть воду из журналов упавших воркеров
+        self._ensure_started()
+        # не читаем посреди сброса, иначе пачка посчитается дважды или ни разу
+        with self._flush_lock:
+            result = query()
+            key, shard = (tg_id, day), shard_of(tg_id)
+            with self._lock:
+                unwritten = sum(groups.get(shard, {}).get(key, 0) for _, _, groups in self._segments)
+                return result, self._pending.get(key, 0) + unwritten
+
+    def total(self, tg_id, day):
+        """Сумма за день с учётом ещё не записанных прибавок."""
+        stored, extra = self.read(tg_id, day, lambda: day_total(tg_id, day))
+        return stored + extra
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._pending:
+                    batch, self._pending = self._pending, {}
+                    path = self._rotate_journal()
+                    self._segments.append((path, self._seq, _by_shard(batch)))
+                if not self._segments:
+                    return 0
+            written = 0
+            # сегмент, не записанный прошлым сбросом, идёт первым: seq в шарде только растёт
+            while self._segments:
+                path, seq, groups = self._segments[0]
+                while groups:
+                    shard = next(iter(groups))
+                    _write(shard, groups[shard], self._writer, seq)
+                    with self._lock:
+                        written += len(groups.pop(shard))
+                with self._lock:
+                    self._segments.pop(0)
+                if path:
+                    os.remove(path)
+            self.flushes += 1
+            self.flushed_rows += written
+            return written
+
+
+water_buffer = WaterBuffer()
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from db import get_conn
+
+# Вода хранится в water_days (tg_id, day, amount_ml) WITHOUT ROWID: day — порядковый номер дня
+# (date.toordinal()), строки одного пользователя лежат подряд в кластерном ключе, поэтому
+# диапазон за год — один поиск по B-дереву и последовательное чтение, без обращений к rowid.
+
+# julianday(day) - JULIAN_OFFSET == date.fromisoformat(day).toordinal()
+JULIAN_OFFSET = 1721424.5
+SPARK = "▁▂▃▄▅▆▇█"
+PERIODS = {"week": 7, "month": 30, "year": 365}
+MONTHS = ("янв", "фев", "мар", "апр", "май", "июн", "июл", "авг", "сен", "окт", "ноя", "дек")
+
+RANGE_SQL = "SELECT day, amount_ml FROM water_days WHERE tg_id = ? AND day BETWEEN ? AND ?"
+DAY_SQL = "SELECT amount_ml FROM water_days WHERE tg_id = ? AND day = ?"
+
+
+def ordinal(day):
+    """"2026-01-31" или date -> порядковый номер дня."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.toordinal()
+
+
+def day_total(tg_id, day, conn=None):
+    r = (conn or get_conn(tg_id)).execute(DAY_SQL, (tg_id, ordinal(day))).fetchone()
+    return r[0] if r else 0
+
+
+def series(tg_id, first, last):
+    """Значения по дням с first по last включительно (дни без записей — 0)."""
+    start = ordinal(first)
+    values = [0] * (ordinal(last) - start + 1)
+    for day, amount in get_conn(tg_id).execute(RANGE_SQL, (tg_id, start, start + len(values) - 1)):
+        values[day - start] = amount
+    return values
+
+
+def sparkline(values):
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK[0] * len(values)
+    return "".join(SPARK[round(max(v, 0) / top * (len(SPARK) - 1))] for v in values)
+
+
+def monthly(values, first):
+    """Дневные значения -> [(месяц, среднее за дни месяца в диапазоне)]."""
+    months = []
+    for i, v in enumerate(values):
+        d = first + timedelta(days=i)
+        if not months or months[-1][0] != (d.year, d.month):
+            months.append(((d.year, d.month), []))
+        months[-1][1].append(v)
+    return [(MONTHS[m - 1], sum(vs) / len(vs)) for (_, m), vs in months]
+
+
+def period_text(period, values, first, goal):
+    days = len(values)
+    avg = sum(values) / days
+    met = sum(1 for v in values if v >= goal)
+    title = {"week": "неделю", "month": "30 дней", "year": "год"}[period]
+    lines = [f"💧 Вода за {title}: в среднем {avg:.0f} мл/день, норма {goal} мл выполнена {met} из {days} дн.",
+             f"Лучший день: {max(values)} мл"]
+    if period == "year":
+        months = monthly(values, first)
+        lines.append(sparkline([v for _, v in months]))
+        lines.append(" ".join(f"{name} {v / 1000:.1f}л" for name, v in months))
+    else:
+        lines.append(f"{first.strftime('%d.%m')} {sparkline(values)} {(first + timedelta(days=days - 1)).strftime('%d.%m')}")
+    return "\n".join(lines)